@@ -8,9 +8,13 @@ from . import globals
 importlib.reload(globals)
 globals.init()
 
-from .parametric_objects import leaf, leaf_textures
-from .lsystem_generation import parametric_lsystem
+from .parametric_objects import mesh_cache, leaf, leaf_cache, leaf_textures
+from .parametric_objects import material_library, ground_plane, template_library
+from .lsystem_generation import parametric_lsystem, canopy_generation, derivation_cache
+from .lsystem_interpretation import command_stream, turtle, scene_teardown, scene_diff
 from .lsystem_interpretation import draw_lsystem
+from .lsystem_interpretation import merged_mesh, step_cache
+from .lsystem_interpretation import point_instancer
 from .parametric_objects import wheat_head
 from .properties import camera_render_properties, plant_properties
 from .panels import debug_panel, plant_panel
@@ -25,13 +29,27 @@ from .operators import (
 
 
 importlib.reload(parametric_lsystem)
+importlib.reload(derivation_cache)
+importlib.reload(canopy_generation)
+importlib.reload(mesh_cache)
 importlib.reload(leaf)
+importlib.reload(leaf_cache)
 importlib.reload(leaf_textures)
+importlib.reload(material_library)
+importlib.reload(ground_plane)
+importlib.reload(template_library)
 importlib.reload(wheat_head)
 importlib.reload(plant_properties)
 importlib.reload(camera_render_properties)
 importlib.reload(plant_panel)
+importlib.reload(command_stream)
+importlib.reload(turtle)
+importlib.reload(merged_mesh)
+importlib.reload(scene_teardown)
+importlib.reload(scene_diff)
+importlib.reload(step_cache)
 importlib.reload(draw_lsystem)
+importlib.reload(point_instancer)
 importlib.reload(lsystem_generation_operator)
 importlib.reload(lsystem_drawing_operator)
 importlib.reload(lsystem_next_operator)
@@ -70,6 +88,7 @@ def register():
     )
     bpy.app.handlers.render_complete.append(camera_render_operator.post_render)
     bpy.app.handlers.render_cancel.append(camera_render_operator.post_render)
+    bpy.app.handlers.load_post.append(mesh_cache.forget_cached_meshes)
 
 
 def unregister():
@@ -78,6 +97,7 @@ def unregister():
     )
     bpy.app.handlers.render_complete.remove(camera_render_operator.post_render)
     bpy.app.handlers.render_cancel.remove(camera_render_operator.post_render)
+    bpy.app.handlers.load_post.remove(mesh_cache.forget_cached_meshes)
 
     for cls in reversed(CLASSES):
         bpy.utils.unregister_class(cls)
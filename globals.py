@@ -22,7 +22,7 @@ importlib.reload(draw_lsystem)
 
 
 def init():
-    # Two-dimensional list of lstring states for each plant model
+    # List of lstring states (LazyDerivation) for each plant model, indexed by plant and iteration step
     global global_lstring_states
     global_lstring_states = []
 
@@ -33,6 +33,18 @@ def init():
         "simple": (example_model.example_plant, draw_lsystem.DrawLSystem),
     }
 
+    # Grammar part of each plant model without Blender material setup, used by worker processes
+    global plant_grammars
+    plant_grammars = {
+        "wheat": wheat_model.wheat_grammar,
+        "maize": maize_model.maize_grammar,
+        "simple": example_model.example_plant,
+    }
+
+    # Organs drawn by the last drawing operator, kept for incremental redraws (CanopyDiff)
+    global drawn_canopy
+    drawn_canopy = None
+
     global plant_labels
     plant_labels = dict()
 
@@ -0,0 +1,105 @@
+"""Derivation of all plant L-Systems of a canopy, optionally fanned out to worker processes"""
+
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from . import derivation_cache
+from .parametric_lsystem import LazyDerivation
+
+
+def can_run_parallel():
+    """Worker processes are forked since they can not import bpy on their own"""
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def derive_plant(grammar, grammar_args, random_state, checkpoint_interval):
+    """Derive the production states of a single plant. Runs in a worker process.
+
+    The grammar is rebuilt from the random state captured before it was set up in the main process,
+    so the worker derives exactly the same plant.
+    """
+    random.setstate(random_state)
+    lsystem, _, _ = grammar(*grammar_args)
+    return lsystem.generate(
+        lazy=True, checkpoint_interval=checkpoint_interval
+    ).checkpoints
+
+
+def derive_canopy(
+    plants,
+    grammar,
+    checkpoint_interval=1,
+    parallel=False,
+    workers=None,
+    cache_directory=None,
+):
+    """Derive the lstring states of all plants of a canopy.
+
+    Args:
+        plants (list): (lsystem, grammar_args, random_state) for each plant, set up in the main process.
+        grammar (callable): Grammar of the plant model, used in worker processes and for cache keys.
+        checkpoint_interval (int, optional): Keep every n-th production state. Defaults to 1.
+        parallel (bool, optional): Derive plants in worker processes. Defaults to False.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPU cores.
+        cache_directory (str, optional): Directory of the on-disk lstring cache, no caching if empty.
+
+    Returns:
+        list: LazyDerivation for each plant, in the same order as plants.
+    """
+    checkpoint_interval = max(1, checkpoint_interval)
+    all_checkpoints = [None] * len(plants)
+
+    keys = [None] * len(plants)
+    if cache_directory:
+        for plant_index, (_, grammar_args, random_state) in enumerate(plants):
+            keys[plant_index] = derivation_cache.cache_key(
+                grammar, grammar_args, random_state, checkpoint_interval
+            )
+            all_checkpoints[plant_index] = derivation_cache.load(
+                cache_directory, keys[plant_index]
+            )
+        hits = sum(checkpoints is not None for checkpoints in all_checkpoints)
+        print(f"Lstring cache: {hits} of {len(plants)} plants loaded")
+
+    missing = [
+        plant_index
+        for plant_index, checkpoints in enumerate(all_checkpoints)
+        if checkpoints is None
+    ]
+    if parallel and len(missing) > 1 and can_run_parallel():
+        workers = min(workers or os.cpu_count() or 1, len(missing))
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            futures = [
+                executor.submit(
+                    derive_plant,
+                    grammar,
+                    plants[plant_index][1],
+                    plants[plant_index][2],
+                    checkpoint_interval,
+                )
+                for plant_index in missing
+            ]
+            # Results are merged in plant order, independent of which worker finished first
+            for plant_index, future in zip(missing, futures):
+                all_checkpoints[plant_index] = future.result()
+    else:
+        for plant_index in missing:
+            lsystem = plants[plant_index][0]
+            all_checkpoints[plant_index] = lsystem.generate(
+                lazy=True, checkpoint_interval=checkpoint_interval
+            ).checkpoints
+
+    if cache_directory:
+        for plant_index in missing:
+            derivation_cache.store(
+                cache_directory, keys[plant_index], all_checkpoints[plant_index]
+            )
+
+    return [
+        LazyDerivation(lsystem, checkpoints, lsystem.iterations + 1)
+        for (lsystem, _, _), checkpoints in zip(plants, all_checkpoints)
+    ]
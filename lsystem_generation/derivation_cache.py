@@ -0,0 +1,99 @@
+"""Persistent on-disk cache of derived L-System production states.
+
+Entries are keyed by the plant model grammar, its arguments that change the production (plant seed, derivation
+length), the random state the grammar was set up with, the checkpoint interval and a hash of the grammar source files.
+"""
+
+import functools
+import hashlib
+import os
+import struct
+import sys
+import zlib
+
+from . import parametric_lsystem
+from .parametric_lsystem import ModuleString
+
+CACHE_FORMAT_VERSION = 1
+CACHE_FILE_EXTENSION = ".lsys"
+_MAGIC = b"LSYS"
+_ENTRY_HEADER = "<II"
+
+
+@functools.lru_cache(maxsize=None)
+def grammar_version(grammar):
+    """Hash of the source files a grammar depends on, changes whenever the grammar or the L-System is edited"""
+    digest = hashlib.sha256()
+    for module in (sys.modules[grammar.__module__], parametric_lsystem):
+        with open(module.__file__, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def cache_key(grammar, grammar_args, random_state, checkpoint_interval):
+    """Content address of the derivation of a single plant. Mask and plant indices are only used by the
+    interpretation rules, they do not change the production states, so plants with the same derivation share
+    an entry.
+    """
+    derivation_length, plant_seed, _, _, _ = grammar_args
+    key = (
+        CACHE_FORMAT_VERSION,
+        f"{grammar.__module__}.{grammar.__qualname__}",
+        grammar_version(grammar),
+        plant_seed,
+        derivation_length,
+        checkpoint_interval,
+        # Grammars may draw random values before seeding with the plant seed
+        hashlib.sha256(repr(random_state).encode("utf-8")).hexdigest(),
+    )
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+def cache_path(cache_directory, key):
+    return os.path.join(cache_directory, key[:2], key + CACHE_FILE_EXTENSION)
+
+
+def load(cache_directory, key):
+    """Returns the cached checkpoint states {step: ModuleString} or None if there is no valid entry"""
+    path = cache_path(cache_directory, key)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+        if data[: len(_MAGIC)] != _MAGIC:
+            return None
+        data = zlib.decompress(data[len(_MAGIC) :])
+
+        checkpoints = {}
+        position = 0
+        entry_header_size = struct.calcsize(_ENTRY_HEADER)
+        while position < len(data):
+            step, size = struct.unpack_from(_ENTRY_HEADER, data, position)
+            position += entry_header_size
+            checkpoints[step] = ModuleString.from_bytes(
+                data[position : position + size]
+            )
+            position += size
+        return checkpoints
+    except (OSError, zlib.error, struct.error, ValueError, StopIteration) as e:
+        print(f"Ignoring invalid lstring cache file {path}: {e}")
+        return None
+
+
+def store(cache_directory, key, checkpoints):
+    """Write checkpoint states {step: ModuleString} to the cache"""
+    entries = []
+    for step, state in sorted(checkpoints.items()):
+        state_bytes = state.to_bytes()
+        entries.append(struct.pack(_ENTRY_HEADER, step, len(state_bytes)))
+        entries.append(state_bytes)
+
+    path = cache_path(cache_directory, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first, concurrent pipeline runs never read partial entries
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(_MAGIC)
+        file.write(zlib.compress(b"".join(entries)))
+    os.replace(temporary_path, path)
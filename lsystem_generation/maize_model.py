@@ -1,17 +1,23 @@
 import math
 
+from ..parametric_objects import material_library
 from ..parametric_objects.leaf_textures import create_grass_texture
-from ..parametric_objects.spline import Spline2D
+from ..parametric_objects.spline import shared_spline
 import bpy
 from . import parametric_lsystem
 import random
 import numpy as np
 
 
-def maize(
-    derivation_length, plant_seed, base_mask_index, mask_indices, current_plant_index
-):
-    """L-System for maize"""
+def aging_production_rule(symbol, params):
+    age = params[0]
+    n = params[1]
+    return ((symbol, (age + 1, n)),)
+
+
+def maize_materials():
+    if material_library.is_current("maize", ["LeafMaterial"], __name__):
+        return
 
     # Material cleanup
     old_leaf_material = bpy.data.materials.get("LeafMaterial", None)
@@ -30,6 +36,27 @@ def maize(
         leaf_material = old_leaf_material
     leaf_material.diffuse_color = (0, 1, 0, 1)
     leaf_material.specular_intensity = 0.1
+    material_library.mark_current("maize", ["LeafMaterial"], __name__)
+
+
+def maize(
+    derivation_length, plant_seed, base_mask_index, mask_indices, current_plant_index
+):
+    """L-System for maize"""
+    maize_materials()
+    return maize_grammar(
+        derivation_length,
+        plant_seed,
+        base_mask_index,
+        mask_indices,
+        current_plant_index,
+    )
+
+
+def maize_grammar(
+    derivation_length, plant_seed, base_mask_index, mask_indices, current_plant_index
+):
+    """L-System grammar for maize without material setup. Does not use bpy, can run in worker processes"""
 
     PLASTOCHRON = 5
     dT = 1  # Time step size
@@ -48,39 +75,46 @@ def maize(
     def get_leaf_age_in_range(age):
         return min(float(age) / MaxLeafAge, 1)
 
-    target_angle_spline = Spline2D(
+    target_angle_spline = shared_spline(
         np.array([[0, 0.4], [0.3, 0.2], [0.5, 0.25], [1, 0.1]])
     )
 
     def br_target_angle(n):
         return target_angle_spline.evaluate(get_leaf_rank_in_range(n))[1]
 
-    branching_angle_spline = Spline2D(
+    branching_angle_spline = shared_spline(
         np.array([[0, 0.01], [0.2, 0.05], [0.3, 0.2], [0.5, 0.6], [1, 1]])
     )
 
     def br_angle(age):
         return branching_angle_spline.evaluate(get_leaf_age_in_range(age))[1]
 
-    def apex_production_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-
-        age = params_int[0]
-        n = params_int[1]
+    def apex_production_rule(symbol, params):
+        age = params[0]
+        n = params[1]
 
         age += dT
 
         if age >= PLASTOCHRON:
             age = age - PLASTOCHRON
-            return f"I({age}, {n})[L({age},{n})]/(180)A({age},{n + 1})"
+            return (
+                ("I", (age, n)),
+                ("[", ()),
+                ("L", (age, n)),
+                ("]", ()),
+                ("/", (180,)),
+                ("A", (age, n + 1)),
+            )
         else:
-            return f"A({age},{n})"
+            return (("A", (age, n)),)
 
     def internode_length(age):
         length = float(age) / MaxLeafAge
         return min(1, max(0.2, length))
 
-    InternodeTargetLen = Spline2D(np.array([[0, 0.1], [0.3, 1.1], [0.7, 0.8], [1, 1]]))
+    InternodeTargetLen = shared_spline(
+        np.array([[0, 0.1], [0.3, 1.1], [0.7, 0.8], [1, 1]])
+    )
 
     def internode_target_length(n):
         return InternodeTargetLen.evaluate(get_leaf_rank_in_range(n))[1]
@@ -88,17 +122,17 @@ def maize(
     def internode_width(n):
         return 0.4
 
-    def internode_interpretation_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-
-        age = params_int[0]
-        n = params_int[1]
+    def internode_interpretation_rule(symbol, params):
+        age = params[0]
+        n = params[1]
 
         len: float = IntLen * internode_target_length(n) * internode_length(age)
         wid: float = internode_width(n)
-        return f"_({wid})F({len})"
+        return (("_", (wid,)), ("F", (len,)))
 
-    LeafTargetLen = Spline2D(np.array([[0, 0.1], [0.3, 1.2], [0.7, 1.0], [1, 0.5]]))
+    LeafTargetLen = shared_spline(
+        np.array([[0, 0.1], [0.3, 1.2], [0.7, 1.0], [1, 0.5]])
+    )
 
     def leaf_target_len(n):
         return LeafTargetLen.evaluate(get_leaf_rank_in_range(n))[1]
@@ -106,19 +140,18 @@ def maize(
     def leaf_length(age):
         return get_leaf_age_in_range(age)
 
-    LeafLengthSpline = Spline2D(
+    LeafLengthSpline = shared_spline(
         np.array([[0, 0.01], [0.2, 0.05], [0.3, 0.2], [0.5, 0.6], [1, 1]])
     )
 
     def leaf_length(age):
         return LeafLengthSpline.evaluate(get_leaf_age_in_range(age))[1]
 
-    LeafBend = Spline2D(np.array([[0, 0.1], [0.3, 0.2], [0.7, 0.3], [1, 0.3]]))
+    LeafBend = shared_spline(np.array([[0, 0.1], [0.3, 0.2], [0.7, 0.3], [1, 0.3]]))
 
-    def leaf_interpretation_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-        age = params_int[0]
-        n = params_int[1]
+    def leaf_interpretation_rule(symbol, params):
+        age = params[0]
+        n = params[1]
 
         len: float = LeafLen * leaf_target_len(n) * leaf_length(age)
 
@@ -128,23 +161,30 @@ def maize(
 
         # TODO: Calculate dynamic leaf width
         leaf_width = 0.12 * len
-        return f"L({leaf_width},{len},{leaf_bend},{orientation},{n},{plant_seed},LeafMaterial)"
-
-    def aging_production_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-        age = params_int[0]
-        n = params_int[1]
-        return f"{symbol}({age + 1},{n})"
+        return (
+            (
+                "L",
+                (
+                    leaf_width,
+                    len,
+                    leaf_bend,
+                    orientation,
+                    n,
+                    plant_seed,
+                    "LeafMaterial",
+                ),
+            ),
+        )
 
     production_rules = {
-        lambda s: s.startswith("A"): apex_production_rule,
-        lambda s: s.startswith("I"): aging_production_rule,
-        lambda s: s.startswith("L"): aging_production_rule,
+        "A": apex_production_rule,
+        "I": aging_production_rule,
+        "L": aging_production_rule,
     }
 
     interpretation_rules = {
-        lambda s: s.startswith("I"): internode_interpretation_rule,
-        lambda s: s.startswith("L"): leaf_interpretation_rule,
+        "I": internode_interpretation_rule,
+        "L": leaf_interpretation_rule,
     }
 
     lsystem = parametric_lsystem.ParametricLSystem(
@@ -152,5 +192,7 @@ def maize(
         production_rules=production_rules,
         iterations=derivation_length,
         interpretation_rules=interpretation_rules,
+        # Rule results of this plant only, freed with its derivation
+        rule_cache=parametric_lsystem.RuleCache(),
     )
-    return lsystem.generate(), 0, mask_indices
+    return lsystem, 0, mask_indices
@@ -1,32 +1,319 @@
-import random
-import bpy
+import struct
+from array import array
+from collections import OrderedDict
+
+
+class ModuleString:
+    """Derivation state of an L-System stored as arrays instead of a single string.
+
+    Module ``i`` consists of the symbol ``chr(symbols[i])`` and the parameters
+    ``params[offsets[i]:offsets[i + 1]]``. Parameters are kept as parsed values (int, float or str),
+    so production rules never have to parse or format strings. The string form is only rendered on demand.
+    """
+
+    __slots__ = ("symbols", "offsets", "params")
+
+    def __init__(self, modules=()):
+        self.symbols = array("I")
+        self.offsets = array("I", [0])
+        self.params = []
+        if modules:
+            self.extend(modules)
+
+    @classmethod
+    def from_string(cls, lstring: str):
+        """Parse a string of the form 'A(1,2)[+(30)F]' in a single pass"""
+        modules = cls()
+        index = 0
+        length = len(lstring)
+        while index < length:
+            symbol = lstring[index]
+            index += 1
+            if symbol.isspace():
+                continue
+            if index < length and lstring[index] == "(":
+                end = lstring.index(")", index + 1)
+                params_string = lstring[index + 1 : end]
+                params = (
+                    [parse_value(value) for value in params_string.split(",")]
+                    if params_string.strip()
+                    else ()
+                )
+                index = end + 1
+            else:
+                params = ()
+            modules.append(symbol, params)
+        return modules
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.symbols)
+        return (
+            chr(self.symbols[index]),
+            self.params[self.offsets[index] : self.offsets[index + 1]],
+        )
+
+    def __iter__(self):
+        params = self.params
+        offsets = self.offsets
+        for index, symbol_id in enumerate(self.symbols):
+            yield chr(symbol_id), params[offsets[index] : offsets[index + 1]]
+
+    def __eq__(self, other):
+        if not isinstance(other, ModuleString):
+            return NotImplemented
+        return (
+            self.symbols == other.symbols
+            and self.offsets == other.offsets
+            and self.params == other.params
+        )
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return f"ModuleString({self.to_string()!r})"
+
+    def append(self, symbol: str, params=()):
+        self.symbols.append(ord(symbol))
+        self.params.extend(params)
+        self.offsets.append(len(self.params))
+
+    def extend(self, modules):
+        """Append modules given as a ModuleString, a lstring or an iterable of (symbol, parameters) tuples"""
+        if isinstance(modules, str):
+            modules = ModuleString.from_string(modules)
+        if isinstance(modules, ModuleString):
+            shift = len(self.params)
+            self.symbols.extend(modules.symbols)
+            self.offsets.extend(offset + shift for offset in modules.offsets[1:])
+            self.params.extend(modules.params)
+            return
+        for symbol, params in modules:
+            self.append(symbol, params)
+
+    def to_string(self) -> str:
+        return "".join(format_module(symbol, params) for symbol, params in self)
+
+    def to_bytes(self) -> bytes:
+        """Binary form of the modules. Parameters are split by type into int, float and string buffers"""
+        kinds = array("B")
+        ints = array("q")
+        floats = array("d")
+        strings = []
+        for param in self.params:
+            if isinstance(param, int):
+                kinds.append(PARAM_INT)
+                ints.append(param)
+            elif isinstance(param, float):
+                kinds.append(PARAM_FLOAT)
+                floats.append(param)
+            else:
+                kinds.append(PARAM_STRING)
+                strings.append(str(param))
+        strings_bytes = "\0".join(strings).encode("utf-8")
+
+        header = struct.pack(
+            _BYTES_HEADER,
+            len(self.symbols),
+            len(self.params),
+            len(ints),
+            len(floats),
+            len(strings_bytes),
+        )
+        return b"".join(
+            (
+                header,
+                self.symbols.tobytes(),
+                self.offsets.tobytes(),
+                kinds.tobytes(),
+                ints.tobytes(),
+                floats.tobytes(),
+                strings_bytes,
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """Inverse of to_bytes()"""
+        num_modules, num_params, num_ints, num_floats, strings_length = (
+            struct.unpack_from(_BYTES_HEADER, data)
+        )
+        position = struct.calcsize(_BYTES_HEADER)
+
+        def read_array(typecode, count):
+            nonlocal position
+            values = array(typecode)
+            size = values.itemsize * count
+            values.frombytes(data[position : position + size])
+            position += size
+            return values
+
+        modules = cls()
+        modules.symbols = read_array("I", num_modules)
+        modules.offsets = read_array("I", num_modules + 1)
+        kinds = read_array("B", num_params)
+        ints = iter(read_array("q", num_ints))
+        floats = iter(read_array("d", num_floats))
+        strings_bytes = data[position : position + strings_length]
+        strings = iter(strings_bytes.decode("utf-8").split("\0"))
+
+        sources = {PARAM_INT: ints, PARAM_FLOAT: floats, PARAM_STRING: strings}
+        modules.params = [next(sources[kind]) for kind in kinds]
+        return modules
+
+
+PARAM_INT = 0
+PARAM_FLOAT = 1
+PARAM_STRING = 2
+_BYTES_HEADER = "<5I"
+
+
+def format_module(symbol: str, params) -> str:
+    if len(params) == 0:
+        return symbol
+    return f"{symbol}({','.join(str(param) for param in params)})"
+
+
+def parse_value(value: str):
+    """Convert a single parameter to int or float if possible, otherwise return it as a string"""
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class RuleTable(dict):
+    """Maps symbol ids to rules for one lookup per module.
+
+    Rules can be keyed by symbol ('A') or by a predicate (lambda s: s.startswith("A")). Keyed rules are
+    entered directly, predicates are only scanned the first time a symbol without keyed rule is seen and the
+    result (None if no rule matches) is stored for all following lookups.
+    """
+
+    def __init__(self, rules):
+        super().__init__()
+        self.predicates = []
+        for key, rule in rules.items():
+            if isinstance(key, str):
+                if len(key) != 1:
+                    raise ValueError(f"Rule symbol '{key}' must be a single character")
+                self[ord(key)] = rule
+            else:
+                self.predicates.append((key, rule))
+
+    def __missing__(self, symbol_id):
+        symbol = chr(symbol_id)
+        rule = None
+        for pattern, transformation in self.predicates:
+            if pattern(symbol):
+                rule = transformation
+                break
+        self[symbol_id] = rule
+        return rule
+
+
+class RuleCache:
+    """Bounded LRU cache of rule results keyed by (rule, symbol, parameters) with hit/miss counters.
+
+    Only use it for rules whose result depends on nothing but the symbol and parameters of a module.
+    The rule itself is part of the key, so a single cache can be shared between several L-Systems.
+    Parameter types are part of the key as well, 1, 1.0 and True are different entries.
+    The cache keeps its rules and their closures alive, create it per L-System or clear it when done.
+    """
+
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def __len__(self):
+        return len(self._results)
+
+    def __repr__(self):
+        return f"RuleCache(hits={self.hits}, misses={self.misses}, size={len(self)}, maxsize={self.maxsize})"
+
+    def apply(self, rule, symbol, parameters) -> ModuleString:
+        key = (rule, symbol, tuple(parameters), tuple(map(type, parameters)))
+        result = self._results.get(key, None)
+        if result is not None:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return result
+
+        self.misses += 1
+        result = ModuleString(rule(symbol, parameters))
+        self._results[key] = result
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+        return result
+
+    def clear(self):
+        self._results.clear()
+        self.hits = 0
+        self.misses = 0
 
 
 class ParametricLSystem:
+    """Parametric L-System working on ModuleString states.
+
+    Rules are called as ``rule(symbol, params)`` with the already parsed parameters of a module and return
+    the successor either as lstring, ModuleString or iterable of (symbol, parameters) tuples.
+    Rules are registered by symbol (see add_production_rule()), predicate rules are supported as fallback.
+    Grammars with pure rules can opt in to memoization of rule results by passing a RuleCache.
+    """
+
     def __init__(
-        self, axiom: str, production_rules, iterations: int, interpretation_rules={}
+        self,
+        axiom: str,
+        production_rules,
+        iterations: int,
+        interpretation_rules={},
+        rule_cache: RuleCache = None,
     ):
         self.axiom = axiom
-        self.production_rules = production_rules
+        self.production_rules = dict(production_rules)
         self.iterations = iterations
-        self.interpretation_rules = interpretation_rules
+        self.interpretation_rules = dict(interpretation_rules)
+        self.rule_cache = rule_cache
+        self._rule_tables = {}
 
-    def apply_rules(self, symbol, parameters, mode):
-        if mode == "production":
-            rules = self.production_rules
-        elif mode == "interpretation":
-            rules = self.interpretation_rules
-        else:
-            raise ValueError
+    def add_production_rule(self, symbol: str, rule):
+        self.production_rules[symbol] = rule
+        self._rule_tables.pop("production", None)
 
-        # Check if there is a matching rule and apply it
-        for pattern, transformation in rules.items():
-            if pattern(symbol):
-                return transformation(symbol, parameters)
+    def add_interpretation_rule(self, symbol: str, rule):
+        self.interpretation_rules[symbol] = rule
+        self._rule_tables.pop("interpretation", None)
+
+    def rule_table(self, mode) -> RuleTable:
+        """Returns the dispatch table for 'production' or 'interpretation' rules, built once per rule set"""
+        table = self._rule_tables.get(mode, None)
+        if table is None:
+            if mode == "production":
+                table = RuleTable(self.production_rules)
+            elif mode == "interpretation":
+                table = RuleTable(self.interpretation_rules)
+            else:
+                raise ValueError
+            self._rule_tables[mode] = table
+        return table
+
+    def apply_rules(self, symbol, parameters, mode):
+        rule = self.rule_table(mode)[ord(symbol)]
+        if rule is not None:
+            return rule(symbol, parameters)
         # If no matching rule, return unchanged
-        if parameters == "":
-            return symbol
-        return f"{symbol}({parameters})"
+        return ((symbol, parameters),)
 
     def apply_production_rules(self, symbol, parameters):
         return self.apply_rules(symbol, parameters, "production")
@@ -34,36 +321,162 @@ class ParametricLSystem:
     def apply_interpretation_rules(self, symbol, parameters):
         return self.apply_rules(symbol, parameters, "interpretation")
 
-    def generate(self):
-        """Returns a list of strings holding all intermediate steps of the generated model"""
-        all_production_states = [self.axiom]
-        all_interpretation_states = [""]  # TODO: Interpret axiom
-
-        result = self.axiom
-        for i in range(self.iterations):
-            new_result = ""
-            interpretation_result = ""
-            index = 0
-            while index < len(result):
-                symbol = result[index]
-
-                parameters = ""
-                if index + 1 < len(result) and result[index + 1] == "(":
-                    start = index + 2
-                    end = result.index(")", start)
-                    parameters = result[start:end]
-                    index = end
-                transformed = self.apply_production_rules(symbol, parameters)
-                new_result += transformed
-                interpretation_result += self.apply_interpretation_rules(
-                    symbol, parameters
-                )
-                index += 1
+    def _rewrite(self, state: ModuleString, table: RuleTable) -> ModuleString:
+        result = ModuleString()
+        params = state.params
+        offsets = state.offsets
+        rule_cache = self.rule_cache
+        for index, symbol_id in enumerate(state.symbols):
+            parameters = params[offsets[index] : offsets[index + 1]]
+            rule = table[symbol_id]
+            if rule is None:
+                # Copy unchanged module
+                result.symbols.append(symbol_id)
+                result.params.extend(parameters)
+                result.offsets.append(len(result.params))
+            elif rule_cache is not None:
+                result.extend(rule_cache.apply(rule, chr(symbol_id), parameters))
+            else:
+                result.extend(rule(chr(symbol_id), parameters))
+        return result
+
+    def derive(self, state: ModuleString) -> ModuleString:
+        """Apply the production rules once to every module of a state"""
+        return self._rewrite(state, self.rule_table("production"))
+
+    def interpret(self, state: ModuleString) -> ModuleString:
+        """Apply the interpretation rules to every module of a state"""
+        return self._rewrite(state, self.rule_table("interpretation"))
+
+    def iter_states(self, steps=None, start=None):
+        """Yields (step, production state) tuples while deriving, previous states are not kept.
+
+        Args:
+            steps (iterable, optional): Derivation steps to yield. Derivation stops after the last requested step.
+                Defaults to all steps up to the number of iterations.
+            start (tuple, optional): (step, production state) to continue from instead of the axiom.
+        """
+        if steps is None:
+            wanted = None
+            last_step = self.iterations
+        else:
+            wanted = set(steps)
+            last_step = max(wanted, default=-1)
+
+        if start is None:
+            step, state = 0, ModuleString.from_string(self.axiom)
+        else:
+            step, state = start
+
+        while step <= last_step:
+            if wanted is None or step in wanted:
+                yield step, state
+            if step == last_step:
+                break
+            state = self.derive(state)
+            step += 1
+
+    def iter_interpretations(self, steps=None):
+        """Yields (step, interpreted modules) tuples while deriving.
+
+        The interpretation of step i is based on the production state of step i - 1, step 0 is empty.
+        """
+        if steps is None:
+            steps = range(self.iterations + 1)
+        steps = sorted(set(steps))
+
+        if steps and steps[0] == 0:
+            yield 0, ModuleString()  # TODO: Interpret axiom
+        for step, state in self.iter_states(step - 1 for step in steps if step > 0):
+            yield step + 1, self.interpret(state)
+
+    def generate(self, lazy=False, checkpoint_interval=1):
+        """Returns a list of strings holding all intermediate steps of the generated model.
+
+        With lazy=True only the production states are computed and a LazyDerivation is returned instead,
+        which runs the interpretation rules for a step when it is accessed. It only keeps every
+        checkpoint_interval-th production state, other states are derived again from the closest checkpoint.
+        """
+        if not lazy:
+            return [
+                interpretation.to_string()
+                for _, interpretation in self.iter_interpretations()
+            ]
+
+        checkpoint_interval = max(1, checkpoint_interval)
+        checkpoints = {
+            step: state
+            for step, state in self.iter_states()
+            if step % checkpoint_interval == 0
+        }
+        return LazyDerivation(self, checkpoints, self.iterations + 1)
+
+
+class LazyDerivation:
+    """Sequence of the interpretation strings of a derivation, computed on access.
+
+    Only the production states at checkpoint steps are stored. Interpreting step i uses the production state
+    i - 1 (step 0 is the empty string), missing production states are derived from the closest earlier checkpoint.
+    The most recently requested interpretations are kept in a small cache.
+    """
+
+    def __init__(self, lsystem: ParametricLSystem, checkpoints, length, cache_size=4):
+        self.lsystem = lsystem
+        self.checkpoints = checkpoints
+        self.length = length
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._last_state = (
+            None  # Last re-derived (step, state), allows stepping forward cheaply
+        )
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, step) -> str:
+        return self.modules(step).to_string()
+
+    def __iter__(self):
+        for step in range(len(self)):
+            yield self[step]
+
+    def production_state(self, step) -> ModuleString:
+        """Returns the production state of a derivation step"""
+        state = self.checkpoints.get(step, None)
+        if state is not None:
+            return state
+
+        start_step = max(
+            checkpoint for checkpoint in self.checkpoints if checkpoint < step
+        )
+        start = (start_step, self.checkpoints[start_step])
+        if self._last_state is not None and start_step < self._last_state[0] <= step:
+            start = self._last_state
+
+        for _, state in self.lsystem.iter_states(steps=[step], start=start):
+            self._last_state = (step, state)
+        return state
+
+    def modules(self, step) -> ModuleString:
+        """Returns the interpreted modules of a derivation step"""
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError(f"Derivation step {step} out of range")
+
+        if step in self._cache:
+            self._cache.move_to_end(step)
+            return self._cache[step]
+
+        if step == 0:
+            interpretation = ModuleString()  # TODO: Interpret axiom
+        else:
+            interpretation = self.lsystem.interpret(self.production_state(step - 1))
 
-            result = new_result
-            all_production_states.append(result)
-            all_interpretation_states.append(interpretation_result)
-        return all_interpretation_states
+        self._cache[step] = interpretation
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return interpretation
 
 
 def parse_parameters(params_string, convert_type=float):
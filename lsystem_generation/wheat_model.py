@@ -1,3 +1,4 @@
+from ..parametric_objects import material_library
 from ..parametric_objects.leaf_colors import MaterialType
 from ..parametric_objects.leaf_textures import (
     create_grass_texture,
@@ -5,13 +6,19 @@ from ..parametric_objects.leaf_textures import (
     create_stem_texture,
     create_indexed_grass_texture,
 )
-from ..parametric_objects.spline import Spline2D
+from ..parametric_objects.spline import shared_spline
 import bpy
 from . import parametric_lsystem
 import random
 import numpy as np
 
 
+def aging_production_rule(symbol, params):
+    age = params[0]
+    n = params[1]
+    return ((symbol, (age + 1, n)),)
+
+
 def restore_material(material_name: str, create_function, *args, **kwargs):
     material = bpy.data.materials.get(material_name, None)
     if material is not None:
@@ -26,33 +33,53 @@ def restore_materials(materials):
         restore_material(material_name, create_function, *args, **kwargs)
 
 
-def wheat(
-    derivation_length, plant_seed, base_mask_index, mask_indices, current_plant_index
-):
-    """L-System for wheat"""
+NUM_LEAF_MATERIALS = 10
+NUM_HEAD_MATERIALS = 10
 
-    """Material cleanup"""
-    # TODO: Make these materials unique per plant and name them accordingly or move them out of here
+
+def wheat_materials():
+    """Create the shared wheat materials, existing materials of the current library version are reused"""
     materials = {
         "LeafMaterial": (create_grass_texture, [], {}),
         "StemMaterial": (create_stem_texture, [], {}),
         "HeadMaterial": (create_head_texture, [], {}),
     }
-    num_leaf_materials = 10
-    for i in range(num_leaf_materials):
+    for i in range(NUM_LEAF_MATERIALS):
         materials[f"LeafMaterial_{i}"] = (
             create_indexed_grass_texture,
             [],
             {"index": i, "material_type": MaterialType.LEAF},
         )
-    num_head_materials = 10
-    for i in range(num_head_materials):
+    for i in range(NUM_HEAD_MATERIALS):
         materials[f"HeadMaterial_{i}"] = (
             create_indexed_grass_texture,
             [],
             {"index": i, "small": True, "material_type": MaterialType.HEAD},
         )
+    if material_library.is_current("wheat", materials.keys(), __name__):
+        return
     restore_materials(materials)
+    material_library.mark_current("wheat", materials.keys(), __name__)
+
+
+def wheat(
+    derivation_length, plant_seed, base_mask_index, mask_indices, current_plant_index
+):
+    """L-System for wheat"""
+    wheat_materials()
+    return wheat_grammar(
+        derivation_length,
+        plant_seed,
+        base_mask_index,
+        mask_indices,
+        current_plant_index,
+    )
+
+
+def wheat_grammar(
+    derivation_length, plant_seed, base_mask_index, mask_indices, current_plant_index
+):
+    """L-System grammar for wheat without material setup. Does not use bpy, can run in worker processes"""
 
     PLASTOCHRON = 2  # Time between leaf production
     dT = 1  # Time step size
@@ -90,9 +117,9 @@ def wheat(
     stem_noise = [random.randrange(-2, 2) for x in range(MaxLeafs)]
 
     leaf_material_index = [
-        random.randrange(0, num_leaf_materials, 1) for x in range(MaxLeafs)
+        random.randrange(0, NUM_LEAF_MATERIALS, 1) for x in range(MaxLeafs)
     ]
-    head_material_index = random.randrange(0, num_head_materials, 1)
+    head_material_index = random.randrange(0, NUM_HEAD_MATERIALS, 1)
 
     # A(Age, rank)
     axiom = f"/({start_rotation})A(0,1)"
@@ -103,14 +130,14 @@ def wheat(
     def get_leaf_age_in_range(age):
         return min(float(age) / TotalLeafAge, 1)
 
-    target_angle_spline = Spline2D(
+    target_angle_spline = shared_spline(
         np.array([[0, 0.4], [0.3, 0.2], [0.5, 0.25], [1, 0.1]])
     )
 
     def br_target_angle(n):
         return target_angle_spline.evaluate(get_leaf_rank_in_range(n))[1]
 
-    branching_angle_spline = Spline2D(
+    branching_angle_spline = shared_spline(
         np.array([[0, 0.01], [0.2, 0.05], [0.3, 0.2], [0.5, 0.6], [1, 1]])
     )
 
@@ -120,39 +147,46 @@ def wheat(
     def leaf_angle(n):
         return (n % 2) * 180 if n < 4 else 110 * n
 
-    def apex_production_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-
-        age = params_int[0]
-        n = params_int[1]
+    def apex_production_rule(symbol, params):
+        age = params[0]
+        n = params[1]
 
         age += dT
 
         if n == MaxLeafs:
             if age > TotalLeafAge + StemElongationDuration:
-                return f"H(0,0)"
+                return (("H", (0, 0)),)
             else:
-                return f"A({age},{n})"
+                return (("A", (age, n)),)
 
         if age >= PLASTOCHRON:
             age = age - PLASTOCHRON
-            return f"I({age}, {n})[/({leaf_angle(n)})L({age},{n})])A({age},{n + 1})"
+            return (
+                ("I", (age, n)),
+                ("[", ()),
+                ("/", (leaf_angle(n),)),
+                ("L", (age, n)),
+                ("]", ()),
+                ("A", (age, n + 1)),
+            )
         else:
-            return f"A({age},{n})"
+            return (("A", (age, n)),)
 
     def get_internode_age_in_range(age):
         if age < TotalLeafAge:
             return 0
         return min(float(age - TotalLeafAge) / StemElongationDuration, 1)
 
-    InternodeLengthSpline = Spline2D(
+    InternodeLengthSpline = shared_spline(
         np.array([[0, 0], [0.1, 0.1], [0.2, 0.1], [0.6, 0.1], [0.9, 1], [1, 1]])
     )
 
     def internode_length(age):
         return InternodeLengthSpline.evaluate(get_internode_age_in_range(age))[1]
 
-    InternodeTargetLen = Spline2D(np.array([[0, 0.5], [0.3, 1.1], [0.7, 0.8], [1, 1]]))
+    InternodeTargetLen = shared_spline(
+        np.array([[0, 0.5], [0.3, 1.1], [0.7, 0.8], [1, 1]])
+    )
 
     def internode_target_length(n):
         return InternodeTargetLen.evaluate(get_leaf_rank_in_range(n))[1]
@@ -160,35 +194,38 @@ def wheat(
     def internode_width(n):
         return 0.4
 
-    def internode_interpretation_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-
-        age = params_int[0]
-        n = params_int[1]
+    def internode_interpretation_rule(symbol, params):
+        age = params[0]
+        n = params[1]
 
         len: float = IntLen * internode_target_length(n) * internode_length(age)
         wid: float = internode_width(n)
         return (
-            f"_({wid})+({stem_noise[n]})F({len},StemMaterial,{base_mask_index + n + 1})"
+            ("_", (wid,)),
+            ("+", (stem_noise[n],)),
+            ("F", (len, "StemMaterial", base_mask_index + n + 1)),
         )
 
-    LeafTargetLen = Spline2D(np.array([[0, 0.5], [0.3, 1.2], [0.7, 1.0], [1, 0.5]]))
+    LeafTargetLen = shared_spline(
+        np.array([[0, 0.5], [0.3, 1.2], [0.7, 1.0], [1, 0.5]])
+    )
 
     def leaf_target_len(n):
         return LeafTargetLen.evaluate(get_leaf_rank_in_range(n))[1]
 
     # LeafLengthSpline = Spline2D(np.array([[0,0.05], [0.1, 0.8], [0.3,1],[0.5, 1],[1, 1]]))
-    LeafLengthSpline = Spline2D(np.array([[0, 0.1], [0.1, 0.1], [0.2, 0.3], [1, 1]]))
+    LeafLengthSpline = shared_spline(
+        np.array([[0, 0.1], [0.1, 0.1], [0.2, 0.3], [1, 1]])
+    )
 
     def leaf_length(age):
         return LeafLengthSpline.evaluate(get_leaf_age_in_range(age))[1]
 
-    LeafBend = Spline2D(np.array([[0, 0], [0.3, 0], [0.7, 0.05], [1, 0.1]]))
+    LeafBend = shared_spline(np.array([[0, 0], [0.3, 0], [0.7, 0.05], [1, 0.1]]))
 
-    def leaf_interpretation_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-        age = params_int[0]
-        n = params_int[1]
+    def leaf_interpretation_rule(symbol, params):
+        age = params[0]
+        n = params[1]
 
         len: float = LeafLen * leaf_target_len(n) * leaf_length(age)
 
@@ -198,21 +235,40 @@ def wheat(
 
         # TODO: Calculate dynamic leaf width
         leaf_width = 0.12 * len
-        return f"L({leaf_width},{len},{leaf_bend},{orientation},{n},{plant_seed},LeafMaterial_{leaf_material_index[n]},{base_mask_index + n + MaxLeafs + 2},{internode_width(n)},{min(float(age) / (TotalLeafAge + StemElongationDuration + BootingDuration + HeadingDuration), 1)})"
-
-    def aging_production_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-        age = params_int[0]
-        n = params_int[1]
-        return f"{symbol}({age + 1},{n})"
+        senescence = min(
+            float(age)
+            / (
+                TotalLeafAge
+                + StemElongationDuration
+                + BootingDuration
+                + HeadingDuration
+            ),
+            1,
+        )
+        return (
+            (
+                "L",
+                (
+                    leaf_width,
+                    len,
+                    leaf_bend,
+                    orientation,
+                    n,
+                    plant_seed,
+                    f"LeafMaterial_{leaf_material_index[n]}",
+                    base_mask_index + n + MaxLeafs + 2,
+                    internode_width(n),
+                    senescence,
+                ),
+            ),
+        )
 
-    def head_production_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-        age = params_int[0]
-        n = params_int[1]
+    def head_production_rule(symbol, params):
+        age = params[0]
+        n = params[1]
 
     FINAL_SPIKELETS = random.randrange(50, 58, 1)
-    HeadEmergence = Spline2D(
+    HeadEmergence = shared_spline(
         np.array(
             [
                 [0, 5],
@@ -223,31 +279,53 @@ def wheat(
         )
     )
 
-    def head_interpretation_rule(symbol, params_string):
-        params_int = parametric_lsystem.parse_parameters(params_string, int)
-        age = params_int[0]
-        n = params_int[1]  # Not needed
+    def head_interpretation_rule(symbol, params):
+        age = params[0]
+        n = params[1]  # Not needed
 
-        spikelets = HeadEmergence.evaluate(min(float(age) / HeadingDuration, 1))[1]
+        spikelets = float(
+            HeadEmergence.evaluate(min(float(age) / HeadingDuration, 1))[1]
+        )
 
         final_internode_length = TopInternodeLength * max(
             0, min((float(age) - float(HeadingDuration)) / float(FloweringDuration), 1)
         )
         scale = max(0.3, min(float(age) / float(HeadingDuration), 1))
 
-        return f"F({final_internode_length},StemMaterial,{base_mask_index + MaxLeafs + 1})/({head_rotation})H({spikelets},HeadMaterial_{head_material_index},{base_mask_index},{head_tilt},{plant_seed},{scale})"
+        return (
+            (
+                "F",
+                (
+                    final_internode_length,
+                    "StemMaterial",
+                    base_mask_index + MaxLeafs + 1,
+                ),
+            ),
+            ("/", (head_rotation,)),
+            (
+                "H",
+                (
+                    spikelets,
+                    f"HeadMaterial_{head_material_index}",
+                    base_mask_index,
+                    head_tilt,
+                    plant_seed,
+                    scale,
+                ),
+            ),
+        )
 
     production_rules = {
-        lambda s: s.startswith("A"): apex_production_rule,
-        lambda s: s.startswith("I"): aging_production_rule,
-        lambda s: s.startswith("L"): aging_production_rule,
-        lambda s: s.startswith("H"): aging_production_rule,
+        "A": apex_production_rule,
+        "I": aging_production_rule,
+        "L": aging_production_rule,
+        "H": aging_production_rule,
     }
 
     interpretation_rules = {
-        lambda s: s.startswith("I"): internode_interpretation_rule,
-        lambda s: s.startswith("L"): leaf_interpretation_rule,
-        lambda s: s.startswith("H"): head_interpretation_rule,
+        "I": internode_interpretation_rule,
+        "L": leaf_interpretation_rule,
+        "H": head_interpretation_rule,
     }
 
     mask_indices[current_plant_index] = {
@@ -261,5 +339,7 @@ def wheat(
         production_rules=production_rules,
         iterations=derivation_length,
         interpretation_rules=interpretation_rules,
+        # Rule results of this plant only, freed with its derivation
+        rule_cache=parametric_lsystem.RuleCache(),
     )
-    return lsystem.generate(), base_mask_index + MaxLeafs * 2 + 2, mask_indices
+    return lsystem, base_mask_index + MaxLeafs * 2 + 2, mask_indices
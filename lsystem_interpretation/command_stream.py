@@ -0,0 +1,129 @@
+"""Compiled form of an lstring for drawing.
+
+A CommandStream holds one opcode (the code point of the command symbol) per command and the already converted
+arguments of all commands in a flat list. Numeric arguments are floats, other arguments (material names) stay
+strings, matching what the regex based parsing of the interpreter produced. Streams are compiled directly from the
+ModuleString of a derivation, or from a string with a single pass tokenizer.
+"""
+
+from array import array
+from functools import lru_cache
+
+from ..lsystem_generation.parametric_lsystem import ModuleString
+
+PARENTHESES = (ord("("), ord(")"))
+
+
+@lru_cache(maxsize=4096)
+def parse_argument(text: str):
+    """Float value of an argument if it is a number, otherwise the argument itself. Parsed once per distinct text."""
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def convert_parameter(param):
+    """Convert a parameter of a ModuleString like its string form would be parsed"""
+    if isinstance(param, (int, float)):
+        return float(param)
+    return parse_argument("".join(str(param).split()))
+
+
+class CommandStream:
+    """Drawing commands as opcode array, argument offsets and flat argument list"""
+
+    __slots__ = ("opcodes", "offsets", "args")
+
+    def __init__(self, opcodes=None, offsets=None, args=None):
+        self.opcodes = opcodes if opcodes is not None else array("I")
+        self.offsets = offsets if offsets is not None else array("I", [0])
+        self.args = args if args is not None else []
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __iter__(self):
+        """Yields (symbol, arguments) for every command"""
+        args = self.args
+        offsets = self.offsets
+        for index, opcode in enumerate(self.opcodes):
+            yield chr(opcode), args[offsets[index] : offsets[index + 1]]
+
+    @classmethod
+    def from_modules(cls, modules: ModuleString):
+        """Compile the modules of a derivation without rendering them as string"""
+        if not any(
+            opcode in PARENTHESES or chr(opcode).isspace()
+            for opcode in set(modules.symbols)
+        ):
+            return cls(
+                modules.symbols,
+                modules.offsets,
+                [convert_parameter(param) for param in modules.params],
+            )
+
+        # Symbols that are skipped when drawing from a string are left out
+        stream = cls()
+        for symbol, params in modules:
+            if symbol in "()" or symbol.isspace():
+                continue
+            stream.append(ord(symbol), [convert_parameter(param) for param in params])
+        return stream
+
+    @classmethod
+    def from_string(cls, lstring: str):
+        """Tokenize a string of the form 'F(1,Leaf)[+(30)F]' in a single pass.
+        Whitespace is ignored, arguments in parentheses belong to the preceding symbol.
+        """
+        stream = cls()
+        lstring = "".join(lstring.split())
+        index = 0
+        while True:
+            open_index = lstring.find("(", index)
+            if open_index == -1:
+                stream.extend_symbols(lstring[index:])
+                return stream
+
+            symbols = lstring[index:open_index]
+            close_index = lstring.find(")", open_index + 1)
+            if (
+                close_index == -1
+                or lstring.find("(", open_index + 1, close_index) != -1
+                or not symbols
+                or symbols[-1] == ")"
+            ):
+                # Parenthesis without preceding symbol or closing parenthesis is skipped
+                stream.extend_symbols(symbols)
+                index = open_index + 1
+                continue
+
+            stream.extend_symbols(symbols[:-1])
+            argstring = lstring[open_index + 1 : close_index]
+            args = (
+                [parse_argument(arg) for arg in argstring.split(",")]
+                if argstring
+                else ()
+            )
+            stream.append(ord(symbols[-1]), args)
+            index = close_index + 1
+
+    def extend_symbols(self, symbols: str):
+        """Append commands without arguments, closing parentheses are skipped"""
+        symbols = symbols.replace(")", "")
+        self.opcodes.extend(map(ord, symbols))
+        self.offsets.extend([len(self.args)] * len(symbols))
+
+    def append(self, opcode, args=()):
+        self.opcodes.append(opcode)
+        self.args.extend(args)
+        self.offsets.append(len(self.args))
+
+
+def compile_commands(lstring) -> CommandStream:
+    """Command stream of a CommandStream, ModuleString or string"""
+    if isinstance(lstring, CommandStream):
+        return lstring
+    if isinstance(lstring, ModuleString):
+        return CommandStream.from_modules(lstring)
+    return CommandStream.from_string(lstring)
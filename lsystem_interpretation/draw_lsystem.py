@@ -6,13 +6,47 @@ but updated to work with Blender version 4.2 and modified and extended for addit
 """
 
 import bpy
-import re
-from mathutils import Matrix, Vector
-from math import radians
+import bmesh
+from mathutils import Euler, Matrix, Vector
+import numpy as np
 from typing import Type
 
 from ..parametric_objects import leaf
 from ..parametric_objects import wheat_head
+from ..parametric_objects.leaf_cache import leaf_mesh_cache
+from .command_stream import compile_commands
+from .merged_mesh import MeshBuilder
+from .scene_diff import PlantDiff
+from .scene_teardown import remove_unused_mesh
+from .turtle import Turtle
+
+INTERNODE_MESH_NAME = "InternodeCylinder"
+# Instanced internodes need an invertible scale for their children
+MIN_INSTANCE_SCALE = 1e-5
+
+
+def get_internode_mesh():
+    """Unit cylinder (radius 1, height 1, base at the origin) shared by all instanced internodes"""
+    mesh = bpy.data.meshes.get(INTERNODE_MESH_NAME, None)
+    if mesh is not None:
+        return mesh
+
+    mesh = bpy.data.meshes.new(INTERNODE_MESH_NAME)
+    bm = bmesh.new()
+    bm.loops.layers.uv.new("UVMap")
+    bmesh.ops.create_cone(
+        bm,
+        cap_ends=True,
+        segments=32,
+        radius1=1,
+        radius2=1,
+        depth=1,
+        matrix=Matrix.Translation((0, 0, 0.5)),
+        calc_uvs=True,
+    )
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
 
 
 class DrawLSystem:
@@ -20,19 +54,33 @@ class DrawLSystem:
     symbols by overwritting the custom() method.
     """
 
-    initial_rotation = Matrix.Rotation(radians(-90), 4, "Y")
-
-    def __init__(self, collection, root_object, step_size, line_width) -> None:
-        # Look upwards in Z direction by default
-        # Matrix defines location and rotation of child node relative to its parent
-        self.mat = self.initial_rotation @ Matrix.Identity(4)
+    def __init__(
+        self,
+        collection,
+        root_object,
+        step_size,
+        line_width,
+        instance_internodes=False,
+        mesh_builder: MeshBuilder = None,
+        scene_diff: PlantDiff = None,
+    ) -> None:
+        # Turtle defines location and rotation of child node relative to its parent
+        self.turtle = Turtle()
 
         self.draw_length = step_size  # Length of internodes
-        self.stack = []  # Stack for nested expressions (e.g. F[+(5)F]F)
         self.parent = root_object  # Current parent object
         self.parent_stack = [root_object]  # Stack for parent/child relations
         self.collection = collection
         self.line_width = line_width
+        # Share one cylinder mesh between all internodes, length and width are set as object scale
+        self.instance_internodes = instance_internodes
+        # Add all organs to the mesh builder (MeshBuilder or PointInstancer) instead of creating objects
+        self.mesh_builder = mesh_builder
+        # Reuse the objects of the previous drawing of this plant, only for drawing objects
+        self.scene_diff = scene_diff if mesh_builder is None else None
+        # World matrix of the current parent, only tracked when merging
+        self.parent_world = None
+        self.parent_world_stack = []
 
         # Create a default material for basic objects
         old_default_material = bpy.data.materials.get("DefaultMaterial", None)
@@ -42,38 +90,37 @@ class DrawLSystem:
         else:
             self.default_material = old_default_material
 
-        # Set cursor location for new object
-        bpy.types.Scene.cursor_location = Vector((0, 0, 0))
+        if self.mesh_builder is not None:
+            self.parent_world = np.array(root_object.matrix_basis)
 
-        # Add default cylinder for forward movement
-        self.set_active_layer_collection()
-        bpy.ops.mesh.primitive_cylinder_add(
-            radius=1,
-            depth=1,
-        )
-        self.cylinder = bpy.context.object
-        self.cylinder.location = (0, 0, 0.5)
-        bpy.ops.object.origin_set(type="ORIGIN_CURSOR")
-        self.cylinder.select_set(False)
+        # Default cylinder for forward movement, only created through bpy.data
+        self.internode_mesh = get_internode_mesh()
+        if not self.internode_mesh.materials:
+            self.internode_mesh.materials.append(self.default_material)
+        # Vertices of the unit cylinder, read when the first internode is scaled
+        self.internode_vertices = None
 
     def post_drawing(self):
-        self.cylinder.hide_viewport = True
-        self.cylinder.hide_render = True
+        """Can be overwritten by a subclass. Called after the whole lstring has been interpreted"""
+        pass
 
     def custom(self, symbol, args):
         """Can be overwritten by a subclass. Allows for matching with specific characters and interpreting them in a way specific to a given plant"""
         pass
 
     def reset_matrix(self):
-        self.mat = self.initial_rotation @ Matrix.Identity(4)
+        self.turtle.reset()
 
     def push(self):
-        self.stack.append(self.mat.copy())
+        # Turtle keeps the stack for nested expressions (e.g. F[+(5)F]F)
+        self.turtle.push()
         self.parent_stack.append(self.parent)
+        self.parent_world_stack.append(self.parent_world)
 
     def pop(self):
-        self.mat = self.stack.pop()
+        self.turtle.pop()
         self.parent = self.parent_stack.pop()
+        self.parent_world = self.parent_world_stack.pop()
 
     def turn(self, angle_degrees):
         self._rotate(angle_degrees, "Z")
@@ -85,11 +132,7 @@ class DrawLSystem:
         self._rotate(angle_degrees, "X")
 
     def _rotate(self, angle_degrees, axis):
-        rot = (
-            Matrix.Rotation(radians(angle_degrees), 4, axis).to_3x3()
-            @ self.mat.to_3x3()
-        )
-        self.mat = Matrix.LocRotScale(self.mat.translation, rot, None)
+        self.turtle.rotate(angle_degrees, axis)
 
     def set_width(self, value):
         self.line_width = value
@@ -112,79 +155,241 @@ class DrawLSystem:
             offset (Vector, optional): _description_. Defaults to Vector((0, 0, 0)).
             pass_index (int, optional): _description_. Defaults to 0.
         """
-        self.set_active_layer_collection()
         if objname not in bpy.data.objects.keys():
             raise ValueError(f"Object '{objname}' not found in Blender data.")
+        template = bpy.data.objects[objname]
+        if self.mesh_builder is not None:
+            self.merge_object(
+                template.data, template.rotation_euler, scale, offset, pass_index
+            )
+            return
+
+        def copy_template():
+            copied_object = template.copy()
+            copied_object.data = copied_object.data.copy()
+            return copied_object
+
+        copied_object = self.claim_object(f"object:{objname}", copy_template)
+        self.place_object(
+            copied_object,
+            Vector(self.turtle.position) + offset,
+            (
+                Matrix(self.turtle.local_rotation())
+                @ template.rotation_euler.to_matrix()
+            ).to_euler(),
+            scale,
+        )
+        if self.changed("pass_index", pass_index):
+            copied_object.pass_index = pass_index
 
-        copied_object = bpy.data.objects[objname].copy()
-        copied_object.data = copied_object.data.copy()
-        copied_object.location = self.mat.translation + offset
-        copied_object.scale = scale
-        copied_object.rotation_euler = (
-            self.initial_rotation.inverted()
-            @ self.mat
-            @ bpy.data.objects[objname].rotation_euler.to_matrix().to_4x4()
-        ).to_euler()
-        copied_object.parent = self.parent
-        self.collection.objects.link(copied_object)
-
-        copied_object.pass_index = pass_index
-
-        copied_object.select_set(False)
-
-    def set_active_layer_collection(self):
-        # Set active layer collection
-        layer_collection = bpy.context.view_layer.layer_collection.children[
-            self.collection.name
-        ]
-        bpy.context.view_layer.active_layer_collection = layer_collection
+    def draw_mesh(
+        self,
+        mesh,
+        rotation_euler: Euler,
+        scale: Vector,
+        offset: Vector = Vector((0, 0, 0)),
+        pass_index=0,
+        organ_type="mesh",
+    ):
+        """Draw an object that links a mesh shared with other objects (e.g. from the leaf mesh cache)
+        instead of copying it. Placed like in draw_object().
 
-    def draw_internode_module(self, length=None, material_name=None, pass_index=0):
-        self.set_active_layer_collection()
+        Args:
+            mesh (bpy.types.Mesh): Mesh of the new object.
+            rotation_euler (Euler): Rotation of the object itself, applied before the turtle rotation.
+            scale (Vector): Scale of the object in x,y,z direction.
+            offset (Vector, optional): Translation added to the turtle position. Defaults to Vector((0, 0, 0)).
+            pass_index (int, optional): Pass index for segmentation masks. Defaults to 0.
+            organ_type (str, optional): Organ type for the identity of the object between redraws. Defaults to "mesh".
+        """
+        if self.mesh_builder is not None:
+            self.merge_object(mesh, rotation_euler, scale, offset, pass_index)
+            return
 
-        draw_length = length if length is not None else self.draw_length
+        obj = self.claim_object(
+            organ_type, lambda: bpy.data.objects.new(mesh.name, mesh)
+        )
+        if self.changed("mesh", mesh.name) and obj.data != mesh:
+            previous_mesh = obj.data
+            obj.data = mesh
+            remove_unused_mesh(previous_mesh)
+        self.place_object(
+            obj,
+            Vector(self.turtle.position) + offset,
+            (
+                Matrix(self.turtle.local_rotation()) @ rotation_euler.to_matrix()
+            ).to_euler(),
+            scale,
+        )
+        if self.changed("pass_index", pass_index):
+            obj.pass_index = pass_index
+
+    def claim_object(self, organ_type, create):
+        """Object for the next organ of a type. The object drawn for the same organ (organ type, rank) in the
+        previous drawing is reused if there is a scene diff, otherwise create() is called and the object is linked.
+        """
+        obj = None if self.scene_diff is None else self.scene_diff.claim(organ_type)
+        if obj is None:
+            obj = create()
+            self.collection.objects.link(obj)
+            if self.scene_diff is not None:
+                self.scene_diff.add(obj)
+        return obj
+
+    def changed(self, field, value):
+        """Whether a value of the last claimed object has to be written, always True without scene diff"""
+        return self.scene_diff is None or self.scene_diff.changed(field, value)
+
+    def place_object(self, obj, location, rotation_euler, scale=None):
+        """Set the transform relative to the current parent, unchanged transforms are not written again"""
+        parent_scale = tuple(self.parent.scale) if self.parent is not None else None
+        transform = (
+            tuple(location),
+            tuple(rotation_euler),
+            tuple(scale) if scale is not None else None,
+            parent_scale,
+        )
+        if not self.changed("transform", transform) and obj.parent == self.parent:
+            return
+        obj.location = location
+        obj.rotation_euler = rotation_euler
+        if scale is not None:
+            obj.scale = scale
+        self.set_parent(obj)
+
+    def set_parent(self, obj):
+        """Parent an object to the current parent. Scale of instanced internodes is not passed on to children."""
+        obj.parent = self.parent
+        if self.parent is not None:
+            scale = self.parent.scale
+            if scale[0] != 1 or scale[1] != 1 or scale[2] != 1:
+                obj.matrix_parent_inverse = Matrix.Diagonal(
+                    (1 / scale[0], 1 / scale[1], 1 / scale[2], 1)
+                )
+            elif self.scene_diff is not None:
+                # Reused objects may have been parented to a scaled internode before
+                obj.matrix_parent_inverse = Matrix.Identity(4)
 
-        cyl = self.cylinder.copy()
-        cyl.data = self.cylinder.data.copy()
+    def draw_internode_module(self, length=None, material_name=None, pass_index=0):
+        draw_length = length if length is not None else self.draw_length
+        if self.mesh_builder is not None:
+            self.merge_internode(draw_length, material_name, pass_index)
+            return
+        if self.instance_internodes:
+            self.draw_internode_instance(draw_length, material_name, pass_index)
+            return
+
+        cyl = self.claim_object(
+            "internode",
+            lambda: bpy.data.objects.new("Cylinder", self.internode_mesh.copy()),
+        )
         # Scale cylinder
-        for vert in cyl.data.vertices:
-            vert.co.x *= self.line_width
-            vert.co.y *= self.line_width
-            vert.co.z *= draw_length
-        self.collection.objects.link(cyl)
+        if self.changed("shape", (self.line_width, draw_length)):
+            if self.internode_vertices is None:
+                self.internode_vertices = np.empty(
+                    len(self.internode_mesh.vertices) * 3, dtype=np.float32
+                )
+                self.internode_mesh.vertices.foreach_get("co", self.internode_vertices)
+            vertices = self.internode_vertices.reshape(-1, 3) * np.array(
+                (self.line_width, self.line_width, draw_length), dtype=np.float32
+            )
+            cyl.data.vertices.foreach_set("co", vertices.ravel())
+            cyl.data.update()
 
         # Translate and rotate cylinder
-        cyl.location = (0, 0, 0)
-        cyl.location = self.mat.translation
-        cyl.rotation_euler = (self.initial_rotation.inverted() @ self.mat).to_euler()
+        self.place_object(
+            cyl,
+            Vector(self.turtle.position),
+            Matrix(self.turtle.local_rotation()).to_euler(),
+        )
 
-        if cyl.data.materials:
-            if material_name is None:
-                cyl.data.materials[0] = self.default_material
+        if self.changed("material", material_name):
+            if cyl.data.materials:
+                if material_name is None:
+                    cyl.data.materials[0] = self.default_material
+                else:
+                    cyl.data.materials[0] = bpy.data.materials[material_name]
             else:
-                cyl.data.materials[0] = bpy.data.materials[material_name]
-        else:
+                if material_name is None:
+                    cyl.data.materials.append(self.default_material)
+                else:
+                    cyl.data.materials.append(bpy.data.materials[material_name])
+
+        # Set parent/child relation
+        self.parent = cyl
+
+        # Reset parent-relative matrix to 'identity'
+        self.reset_matrix()
+
+        # Set pass index for segmentation masks
+        if self.changed("pass_index", pass_index):
+            cyl.pass_index = pass_index
+
+    def draw_internode_instance(self, draw_length, material_name=None, pass_index=0):
+        """Draw an internode as object linked to the shared cylinder mesh"""
+        cyl = self.claim_object(
+            "internode_instance",
+            lambda: bpy.data.objects.new("Internode", self.internode_mesh),
+        )
+        self.place_object(
+            cyl,
+            Vector(self.turtle.position),
+            Matrix(self.turtle.local_rotation()).to_euler(),
+            Vector(
+                (
+                    max(self.line_width, MIN_INSTANCE_SCALE),
+                    max(self.line_width, MIN_INSTANCE_SCALE),
+                    max(draw_length, MIN_INSTANCE_SCALE),
+                )
+            ),
+        )
+
+        # Materials differ between internodes, link them to the object instead of the shared mesh
+        if self.changed("material", material_name):
+            material_slot = cyl.material_slots[0]
+            material_slot.link = "OBJECT"
             if material_name is None:
-                cyl.data.materials.append(self.default_material)
+                material_slot.material = self.default_material
             else:
-                cyl.data.materials.append(bpy.data.materials[material_name])
+                material_slot.material = bpy.data.materials[material_name]
 
         # Set parent/child relation
-        cyl.parent = self.parent
         self.parent = cyl
 
         # Reset parent-relative matrix to 'identity'
         self.reset_matrix()
 
         # Set pass index for segmentation masks
-        cyl.pass_index = pass_index
+        if self.changed("pass_index", pass_index):
+            cyl.pass_index = pass_index
+
+    def merge_internode(self, draw_length, material_name=None, pass_index=0):
+        """Add an internode to the mesh builder, it becomes the parent of the following organs"""
+        world = self.parent_world @ self.turtle.local_matrix()
+        material = (
+            self.default_material
+            if material_name is None
+            else bpy.data.materials[material_name]
+        )
+        self.mesh_builder.add_internode(
+            world, self.line_width, draw_length, material, pass_index
+        )
 
-        cyl.select_set(False)
+        self.parent_world = world
+        self.reset_matrix()
+
+    def merge_object(self, mesh, rotation_euler, scale, offset, pass_index=0):
+        """Add a mesh to the mesh builder, placed like in draw_object()"""
+        local = self.turtle.local_matrix(
+            offset, np.array(rotation_euler.to_matrix()), scale
+        )
+        self.mesh_builder.add_mesh(mesh, self.parent_world @ local, pass_index)
+        # The geometry is copied, meshes the caches do not keep (e.g. leaf cache size 0) are not needed anymore
+        remove_unused_mesh(mesh)
 
     def move(self, length=None):
         draw_length = length if length is not None else self.draw_length
-        trans_vec = self.mat.to_3x3() @ Vector((draw_length, 0, 0))
-        self.mat.translation += trans_vec
+        self.turtle.move(draw_length)
 
 
 def interpret(
@@ -195,19 +400,27 @@ def interpret(
     line_width,
     width_growth_factor,
     interpreter: Type[DrawLSystem] = DrawLSystem,
+    instance_internodes=False,
+    mesh_builder: MeshBuilder = None,
+    scene_diff: PlantDiff = None,
 ):
-    drawer = interpreter(lpy_collection, root_object, step_size, line_width)
-
-    lstring = "".join(lstring.split())
-
-    # split into command symbols with optional parameters
-    commands = re.findall(r"[^()](?:\([^()]*\))?", lstring)
-
-    for cmd in commands:
-        args = extractArgs(cmd)
+    drawer = interpreter(
+        lpy_collection,
+        root_object,
+        step_size,
+        line_width,
+        instance_internodes=instance_internodes,
+        mesh_builder=mesh_builder,
+        scene_diff=scene_diff,
+    )
+
+    # Lstring can be given as string, ModuleString or already compiled CommandStream
+    commands = compile_commands(lstring)
+
+    for symbol, args in commands:
         numArgs = len(args)
 
-        match cmd[0]:
+        match symbol:
             case "F":
                 if numArgs == 0:
                     drawer.draw_internode_module()
@@ -271,25 +484,11 @@ def interpret(
             case "@":
                 if numArgs == 2:
                     drawer.draw_object(args[0], Vector((args[1], args[1], args[1])))
-            case _ as symbol:
+            case _:
                 drawer.custom(symbol, args)
     drawer.post_drawing()
 
 
-def extractArgs(command):
-    """Return a list of the arguments of a command statement, e.g. A(arg1, arg2, .., argn) will return [arg1, arg2, .., argn]"""
-    argstring_list = re.findall(r"\((.+)\)", command)
-    if len(argstring_list) == 0:
-        return []
-    result = []
-    for arg in re.split(",", argstring_list[0]):
-        try:
-            result.append(float(arg))  # try to cast to float
-        except ValueError:
-            result.append(arg)  # else just add string argument
-    return result
-
-
 class DrawWheat(DrawLSystem):
     """Draw a wheat plant in the scene. This extends the DrawLSystem class and implements an additional Leaf and Head symbol."""
 
@@ -338,38 +537,39 @@ class DrawWheat(DrawLSystem):
         internode_width,
         senescence,
     ):
-        leaf.create_wheat_leaf(
+        # The curvature does not change wheat leaves
+        mesh = leaf_mesh_cache.wheat_leaf(
             max_width,
             length,
-            curvature,
-            orientation,
-            "Draw_leaf",
             rank,
             seed,
             material_name,
             internode_width,
             senescence,
         )
-        self.draw_object("Draw_leaf", Vector((1, 1, 1)), pass_index=pass_index)
-        bpy.data.objects.remove(bpy.data.objects.get("Draw_leaf"))
+        self.draw_mesh(
+            mesh,
+            Euler((0, leaf.leaf_rotation_y(orientation), 0)),
+            Vector((1, 1, 1)),
+            pass_index=pass_index,
+            organ_type="leaf",
+        )
 
     def draw_head(
         self, spikelets, material_name, pass_index, head_tilt=0.0, seed=0, scale=1.0
     ):
-        wheat_head.create_wheat_head(
-            int(spikelets), "WheatHead", tilt=head_tilt, seed=seed
+        # Head geometry is already oriented like the first spikelet
+        mesh = wheat_head.wheat_head_mesh(
+            int(spikelets), tilt=head_tilt, seed=seed, material_name=material_name
         )
-        if material_name is not None:
-            head = bpy.data.objects.get("WheatHead")
-            head.data.materials.clear()
-            head.data.materials.append(bpy.data.materials[material_name])
-        self.draw_object(
-            "WheatHead",
+        self.draw_mesh(
+            mesh,
+            Euler((0, 0, 0)),
             scale * Vector((2, 2, 2)),
             Vector((0, 0, -1)),
             pass_index=pass_index,
+            organ_type="head",
         )
-        bpy.data.objects.remove(bpy.data.objects.get("WheatHead"))
 
 
 class DrawMaize(DrawLSystem):
@@ -387,15 +587,12 @@ class DrawMaize(DrawLSystem):
     def draw_leaf(
         self, max_width, length, curvature, orientation, rank, seed, material_name
     ):
-        leaf.create_maize_leaf(
-            max_width,
-            length,
-            curvature,
-            orientation,
-            "Draw_leaf",
-            rank,
-            seed,
-            material_name,
+        mesh = leaf_mesh_cache.maize_leaf(
+            max_width, length, curvature, rank, seed, material_name
+        )
+        self.draw_mesh(
+            mesh,
+            Euler((0, leaf.leaf_rotation_y(orientation), 0)),
+            Vector((1, 1, 1)),
+            organ_type="leaf",
         )
-        self.draw_object("Draw_leaf", Vector((1, 1, 1)))
-        bpy.data.objects.remove(bpy.data.objects.get("Draw_leaf"))
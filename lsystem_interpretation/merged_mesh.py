@@ -0,0 +1,316 @@
+"""Collect the geometry of drawn organs in NumPy buffers and write it as a single Blender mesh.
+
+Creating one object per internode, leaf and head makes object count and depsgraph evaluation the main
+cost for large canopies. The MeshBuilder is used instead by DrawLSystem to merge a plant or a whole canopy.
+"""
+
+from functools import lru_cache
+
+import bpy
+import numpy as np
+
+ORGAN_LABEL_ATTRIBUTE = "organ_label"
+UV_LAYER_NAME = "UVMap"
+CYLINDER_SEGMENTS = 32
+
+
+@lru_cache(maxsize=None)
+def unit_cylinder(segments=CYLINDER_SEGMENTS):
+    """Unit cylinder (radius 1, height 1) with its base at the origin and n-gon caps.
+
+    Returns:
+        tuple: Vertices (V, 3), polygon sizes (P,), loop vertex indices (L,) and loop uvs (L, 2)
+    """
+    i = np.arange(segments)
+    j = (i + 1) % segments
+    angles = 2 * np.pi * i / segments
+
+    vertices = np.zeros((2 * segments, 3))
+    vertices[:segments, 0] = vertices[segments:, 0] = np.cos(angles)
+    vertices[:segments, 1] = vertices[segments:, 1] = np.sin(angles)
+    vertices[segments:, 2] = 1
+
+    sides = np.stack([i, j, j + segments, i + segments], axis=1)
+    bottom = i[::-1]
+    top = i + segments
+    loop_vertices = np.concatenate([sides.ravel(), bottom, top])
+    polygon_sizes = np.concatenate([np.full(segments, 4), [segments, segments]])
+
+    # Sides are unrolled on the lower half of the uv space, caps are circles on the upper half
+    side_u = np.stack([i, i + 1, i + 1, i], axis=1).ravel() / segments
+    side_v = np.tile([0, 0, 0.5, 0.5], segments)
+    bottom_uv = np.stack(
+        [0.25 + 0.25 * np.cos(angles[bottom]), 0.75 + 0.25 * np.sin(angles[bottom])],
+        axis=1,
+    )
+    top_uv = np.stack(
+        [0.75 + 0.25 * np.cos(angles), 0.75 + 0.25 * np.sin(angles)], axis=1
+    )
+    loop_uvs = np.concatenate([np.stack([side_u, side_v], axis=1), bottom_uv, top_uv])
+
+    for array in (vertices, polygon_sizes, loop_vertices, loop_uvs):
+        array.flags.writeable = False
+    return vertices, polygon_sizes, loop_vertices, loop_uvs
+
+
+def mesh_geometry(mesh):
+    """Read the geometry of a Blender mesh into NumPy buffers, uvs are taken from the active uv layer.
+
+    Returns:
+        tuple: Vertices (V, 3), polygon sizes (P,), loop vertex indices (L,), loop uvs (L, 2),
+            material index of each polygon (P,) and smooth shading of each polygon (P,)
+    """
+    vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    polygon_sizes = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", polygon_sizes)
+    material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", material_indices)
+    smooth = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", smooth)
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    loop_uvs = np.zeros(len(mesh.loops) * 2, dtype=np.float32)
+    if mesh.uv_layers.active is not None:
+        mesh.uv_layers.active.data.foreach_get("uv", loop_uvs)
+    return (
+        vertices.reshape(-1, 3),
+        polygon_sizes,
+        loop_vertices,
+        loop_uvs.reshape(-1, 2),
+        material_indices,
+        smooth,
+    )
+
+
+class MeshBuilder:
+    """Accumulates vertices, faces, uvs, material indices and a per-face organ label in world space.
+    The organ label is the pass index of the organ, it is stored as integer face attribute on the merged mesh.
+    """
+
+    def __init__(self) -> None:
+        self.vertices = []
+        self.polygon_sizes = []
+        self.loop_vertices = []
+        self.loop_uvs = []
+        self.material_indices = []
+        self.organ_labels = []
+        self.smooth = []
+        self.materials = []
+        self.material_slots = {}  # Material name -> material index of merged mesh
+        self.vertex_count = 0
+
+        # Internodes are only recorded and transformed together when the mesh is written
+        self.internode_matrices = []
+        self.internode_scales = []
+        self.internode_materials = []
+        self.internode_labels = []
+
+    def __len__(self):
+        return len(self.polygon_sizes) + len(self.internode_matrices)
+
+    def material_index(self, material):
+        key = material.name if material is not None else None
+        index = self.material_slots.get(key, None)
+        if index is None:
+            index = len(self.materials)
+            self.materials.append(material)
+            self.material_slots[key] = index
+        return index
+
+    def add_geometry(
+        self,
+        matrix,
+        vertices,
+        polygon_sizes,
+        loop_vertices,
+        loop_uvs,
+        material_indices,
+        organ_label=0,
+        smooth=False,
+    ):
+        """Transform geometry with a 4x4 matrix and append it to the buffers.
+
+        Args:
+            matrix (Matrix): Local to world transformation
+            vertices (np.ndarray): Vertex positions (V, 3)
+            polygon_sizes (np.ndarray): Number of loops of each polygon (P,)
+            loop_vertices (np.ndarray): Vertex index of each loop (L,)
+            loop_uvs (np.ndarray): Uv coordinates of each loop (L, 2)
+            material_indices (np.ndarray): Material index of merged mesh for each polygon (P,)
+            organ_label (int, optional): Label assigned to all polygons. Defaults to 0.
+            smooth (bool or np.ndarray, optional): Smooth shading of the polygons. Defaults to False.
+        """
+        self.add_instances(
+            np.asarray(matrix, dtype=float)[None],
+            vertices,
+            polygon_sizes,
+            loop_vertices,
+            loop_uvs,
+            material_indices,
+            organ_label,
+            smooth,
+        )
+
+    def add_instances(
+        self,
+        matrices,
+        vertices,
+        polygon_sizes,
+        loop_vertices,
+        loop_uvs,
+        material_indices,
+        organ_labels=0,
+        smooth=False,
+    ):
+        """Append one copy of the geometry per 4x4 matrix, all copies are transformed in one batch.
+
+        Args:
+            matrices (np.ndarray): Local to world transformations (N, 4, 4)
+            vertices (np.ndarray): Vertex positions (V, 3)
+            polygon_sizes (np.ndarray): Number of loops of each polygon (P,)
+            loop_vertices (np.ndarray): Vertex index of each loop (L,)
+            loop_uvs (np.ndarray): Uv coordinates of each loop (L, 2)
+            material_indices (np.ndarray): Material index of merged mesh for each polygon (P,) or copy and polygon (N, P)
+            organ_labels (int or np.ndarray, optional): Label of all polygons or of each copy (N,). Defaults to 0.
+            smooth (bool or np.ndarray, optional): Smooth shading of the polygons. Defaults to False.
+        """
+        matrices = np.asarray(matrices, dtype=float)
+        count = len(matrices)
+        polygon_count = len(polygon_sizes)
+        world = (
+            np.einsum("nij,vj->nvi", matrices[:, :3, :3], vertices)
+            + matrices[:, None, :3, 3]
+        )
+        vertex_offsets = self.vertex_count + len(vertices) * np.arange(count)
+
+        self.vertices.append(world.reshape(-1, 3))
+        self.polygon_sizes.append(np.tile(polygon_sizes, count))
+        self.loop_vertices.append(
+            (np.asarray(loop_vertices) + vertex_offsets[:, None]).ravel()
+        )
+        self.loop_uvs.append(np.tile(loop_uvs, (count, 1)))
+        self.material_indices.append(
+            np.broadcast_to(material_indices, (count, polygon_count)).ravel()
+        )
+        self.organ_labels.append(
+            np.broadcast_to(
+                np.asarray(organ_labels).reshape(-1, 1), (count, polygon_count)
+            ).ravel()
+        )
+        self.smooth.append(np.broadcast_to(smooth, (count, polygon_count)).ravel())
+        self.vertex_count += count * len(vertices)
+
+    def add_internode(self, matrix, width, length, material, organ_label=0):
+        """Add a cylinder of the given width and length along the local z axis"""
+        self.internode_matrices.append(matrix)
+        self.internode_scales.append((width, width, length))
+        self.internode_materials.append(self.material_index(material))
+        self.internode_labels.append(organ_label)
+
+    def flush_internodes(self):
+        """Transform all recorded internodes in one batch and append them to the buffers"""
+        if len(self.internode_matrices) == 0:
+            return
+
+        vertices, polygon_sizes, loop_vertices, loop_uvs = unit_cylinder()
+        # Scale is applied in the local frame of each internode
+        matrices = np.asarray(self.internode_matrices, dtype=float).copy()
+        matrices[:, :3, :3] *= np.asarray(self.internode_scales)[:, None, :]
+        self.add_instances(
+            matrices,
+            vertices,
+            polygon_sizes,
+            loop_vertices,
+            loop_uvs,
+            np.asarray(self.internode_materials)[:, None],
+            np.asarray(self.internode_labels),
+            False,
+        )
+
+        self.internode_matrices.clear()
+        self.internode_scales.clear()
+        self.internode_materials.clear()
+        self.internode_labels.clear()
+
+    def material_indices_of(self, mesh, material_indices):
+        """Map material indices of a mesh to materials of the merged mesh"""
+        slots = [self.material_index(material) for material in mesh.materials]
+        if len(slots) == 0:
+            slots = [self.material_index(None)]
+        return np.asarray(slots)[np.minimum(material_indices, len(slots) - 1)]
+
+    def add_mesh(self, mesh, matrix, organ_label=0):
+        """Append the geometry of a Blender mesh, uvs are taken from the active uv layer"""
+        self.add_mesh_instances(mesh, [matrix], organ_label)
+
+    def add_mesh_instances(self, mesh, matrices, organ_labels=0, geometry=None):
+        """Append one copy of a Blender mesh per matrix.
+
+        Args:
+            mesh (bpy.types.Mesh): Mesh to copy, its materials are added to the merged mesh
+            matrices (np.ndarray): Local to world transformations (N, 4, 4)
+            organ_labels (int or np.ndarray, optional): Label of all polygons or of each copy (N,). Defaults to 0.
+            geometry (tuple, optional): Buffers of the mesh from mesh_geometry(), read from the mesh if None.
+                Defaults to None.
+        """
+        if geometry is None:
+            geometry = mesh_geometry(mesh)
+        vertices, polygon_sizes, loop_vertices, loop_uvs, material_indices, smooth = (
+            geometry
+        )
+        self.add_instances(
+            matrices,
+            vertices,
+            polygon_sizes,
+            loop_vertices,
+            loop_uvs,
+            self.material_indices_of(mesh, material_indices),
+            organ_labels,
+            smooth,
+        )
+
+    def to_mesh(self, name):
+        """Write all buffers into a new Blender mesh"""
+        mesh = bpy.data.meshes.new(name)
+        if len(self) == 0:
+            return mesh
+
+        self.flush_internodes()
+        vertices = np.concatenate(self.vertices)
+        polygon_sizes = np.concatenate(self.polygon_sizes)
+        loop_vertices = np.concatenate(self.loop_vertices)
+        loop_starts = np.zeros(len(polygon_sizes), dtype=np.int32)
+        np.cumsum(polygon_sizes[:-1], out=loop_starts[1:])
+
+        mesh.vertices.add(len(vertices))
+        mesh.vertices.foreach_set("co", vertices.astype(np.float32).ravel())
+        mesh.loops.add(len(loop_vertices))
+        mesh.loops.foreach_set("vertex_index", loop_vertices.astype(np.int32))
+        mesh.polygons.add(len(polygon_sizes))
+        mesh.polygons.foreach_set("loop_start", loop_starts)
+        mesh.polygons.foreach_set(
+            "material_index", np.concatenate(self.material_indices).astype(np.int32)
+        )
+        mesh.polygons.foreach_set("use_smooth", np.concatenate(self.smooth))
+
+        uv_layer = mesh.uv_layers.new(name=UV_LAYER_NAME)
+        uv_layer.data.foreach_set(
+            "uv", np.concatenate(self.loop_uvs).astype(np.float32).ravel()
+        )
+        organ_labels = mesh.attributes.new(ORGAN_LABEL_ATTRIBUTE, "INT", "FACE")
+        organ_labels.data.foreach_set(
+            "value", np.concatenate(self.organ_labels).astype(np.int32)
+        )
+
+        for material in self.materials:
+            mesh.materials.append(material)
+
+        mesh.update(calc_edges=True)
+        return mesh
+
+    def create_object(self, name, collection):
+        """Create an object for the merged mesh and link it to the collection"""
+        obj = bpy.data.objects.new(name, self.to_mesh(f"{name}_mesh"))
+        collection.objects.link(obj)
+        return obj
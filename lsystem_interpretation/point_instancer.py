@@ -0,0 +1,259 @@
+"""Record the organs of drawn plants as points and instance their geometry with geometry nodes.
+
+Instead of one object per organ, every organ becomes a point with its transform, template id and pass index.
+Unique organ geometry (internode cylinder per material, leaves, heads) is kept once as template object and
+instanced on the points by a generated "Instance on Points" node group. Cycles gives instances the pass index of the
+point object, the pass index of each organ is stored as instance attribute instead. Mask renders read it with an
+Attribute node of type Instancer (see camera_render_operator.add_pass_index_aov).
+"""
+
+import bpy
+import numpy as np
+
+from .draw_lsystem import MIN_INSTANCE_SCALE, get_internode_mesh
+
+NODE_GROUP_NAME = "PlantInstancer"
+MODIFIER_NAME = "Instancer"
+TEMPLATE_ID_ATTRIBUTE = "template_id"
+PASS_INDEX_ATTRIBUTE = "pass_index"
+ROTATION_ATTRIBUTE = "rotation"
+SCALE_ATTRIBUTE = "scale"
+
+
+def rotation_quaternions(rotations):
+    """Quaternions (w, x, y, z) of an array of rotation matrices (N, 3, 3)"""
+    m = rotations
+    diagonal = np.stack([m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]], axis=1)
+    trace = diagonal.sum(axis=1)
+    # Compute from the largest component for numerical stability
+    case = np.argmax(np.column_stack([trace, diagonal]), axis=1)
+    quaternions = np.empty((len(m), 4))
+
+    i = case == 0
+    s = 2 * np.sqrt(1 + trace[i])
+    quaternions[i] = np.column_stack(
+        [
+            0.25 * s,
+            (m[i, 2, 1] - m[i, 1, 2]) / s,
+            (m[i, 0, 2] - m[i, 2, 0]) / s,
+            (m[i, 1, 0] - m[i, 0, 1]) / s,
+        ]
+    )
+    i = case == 1
+    s = 2 * np.sqrt(1 + m[i, 0, 0] - m[i, 1, 1] - m[i, 2, 2])
+    quaternions[i] = np.column_stack(
+        [
+            (m[i, 2, 1] - m[i, 1, 2]) / s,
+            0.25 * s,
+            (m[i, 0, 1] + m[i, 1, 0]) / s,
+            (m[i, 0, 2] + m[i, 2, 0]) / s,
+        ]
+    )
+    i = case == 2
+    s = 2 * np.sqrt(1 + m[i, 1, 1] - m[i, 0, 0] - m[i, 2, 2])
+    quaternions[i] = np.column_stack(
+        [
+            (m[i, 0, 2] - m[i, 2, 0]) / s,
+            (m[i, 0, 1] + m[i, 1, 0]) / s,
+            0.25 * s,
+            (m[i, 1, 2] + m[i, 2, 1]) / s,
+        ]
+    )
+    i = case == 3
+    s = 2 * np.sqrt(1 + m[i, 2, 2] - m[i, 0, 0] - m[i, 1, 1])
+    quaternions[i] = np.column_stack(
+        [
+            (m[i, 1, 0] - m[i, 0, 1]) / s,
+            (m[i, 0, 2] + m[i, 2, 0]) / s,
+            (m[i, 1, 2] + m[i, 2, 1]) / s,
+            0.25 * s,
+        ]
+    )
+    return quaternions
+
+
+def instance_rotations(linear, scales):
+    """Rotation matrices of linear transforms (N, 3, 3) with the column norms scales (N, 3).
+    An axis of length 0 (e.g. of an internode of length 0) is recovered from the other two axes,
+    transforms with more than one axis of length 0 get the identity rotation.
+    """
+    zero = scales < MIN_INSTANCE_SCALE
+    rotations = linear / np.where(zero, 1, scales)[:, None, :]
+    single = zero.sum(axis=1) == 1
+    for axis in range(3):
+        i = single & zero[:, axis]
+        rotations[i, :, axis] = np.cross(
+            rotations[i, :, (axis + 1) % 3], rotations[i, :, (axis + 2) % 3]
+        )
+    rotations[zero.sum(axis=1) > 1] = np.eye(3)
+    return rotations
+
+
+def get_instancer_node_group():
+    """Node group instancing the children of a collection on points, picked by the template id attribute.
+    The pass index of the points is stored on the instances.
+    """
+    node_group = bpy.data.node_groups.get(NODE_GROUP_NAME, None)
+    if node_group is not None:
+        return node_group
+
+    node_group = bpy.data.node_groups.new(NODE_GROUP_NAME, "GeometryNodeTree")
+    node_group.interface.new_socket(
+        "Geometry", in_out="INPUT", socket_type="NodeSocketGeometry"
+    )
+    node_group.interface.new_socket(
+        "Templates", in_out="INPUT", socket_type="NodeSocketCollection"
+    )
+    node_group.interface.new_socket(
+        "Geometry", in_out="OUTPUT", socket_type="NodeSocketGeometry"
+    )
+    nodes = node_group.nodes
+    links = node_group.links
+
+    group_input = nodes.new("NodeGroupInput")
+    group_output = nodes.new("NodeGroupOutput")
+
+    # Children are sorted by name, template names are zero padded ids
+    collection_info = nodes.new("GeometryNodeCollectionInfo")
+    collection_info.transform_space = "ORIGINAL"
+    collection_info.inputs["Separate Children"].default_value = True
+    collection_info.inputs["Reset Children"].default_value = True
+    links.new(group_input.outputs["Templates"], collection_info.inputs["Collection"])
+
+    def named_attribute(name, data_type):
+        node = nodes.new("GeometryNodeInputNamedAttribute")
+        node.data_type = data_type
+        node.inputs["Name"].default_value = name
+        return node.outputs["Attribute"]
+
+    instance_on_points = nodes.new("GeometryNodeInstanceOnPoints")
+    instance_on_points.inputs["Pick Instance"].default_value = True
+    links.new(group_input.outputs["Geometry"], instance_on_points.inputs["Points"])
+    links.new(
+        collection_info.outputs["Instances"], instance_on_points.inputs["Instance"]
+    )
+    links.new(
+        named_attribute(TEMPLATE_ID_ATTRIBUTE, "INT"),
+        instance_on_points.inputs["Instance Index"],
+    )
+    links.new(
+        named_attribute(ROTATION_ATTRIBUTE, "QUATERNION"),
+        instance_on_points.inputs["Rotation"],
+    )
+    links.new(
+        named_attribute(SCALE_ATTRIBUTE, "FLOAT_VECTOR"),
+        instance_on_points.inputs["Scale"],
+    )
+
+    store_pass_index = nodes.new("GeometryNodeStoreNamedAttribute")
+    store_pass_index.data_type = "INT"
+    store_pass_index.domain = "INSTANCE"
+    store_pass_index.inputs["Name"].default_value = PASS_INDEX_ATTRIBUTE
+    links.new(
+        instance_on_points.outputs["Instances"], store_pass_index.inputs["Geometry"]
+    )
+    links.new(
+        named_attribute(PASS_INDEX_ATTRIBUTE, "INT"), store_pass_index.inputs["Value"]
+    )
+    links.new(store_pass_index.outputs["Geometry"], group_output.inputs["Geometry"])
+
+    return node_group
+
+
+class PointInstancer:
+    """Collects one point per organ with the same interface as the MeshBuilder.
+    Organs are drawn as instances of template objects shared by all organs with the same mesh and material,
+    the pass index of each organ is kept per point.
+    """
+
+    def __init__(self) -> None:
+        self.matrices = []
+        self.template_ids = []
+        self.pass_indices = []
+        self.templates = {}  # (Mesh name, material name) -> template id
+        self.template_collection = bpy.data.collections.new("Templates")
+        self.template_collection.hide_viewport = True
+        self.template_collection.hide_render = True
+
+    def __len__(self):
+        return len(self.template_ids)
+
+    def template_id(self, mesh, material=None):
+        """Template object for a mesh, optionally with an object linked material"""
+        key = (mesh.name, material.name if material is not None else None)
+        template_id = self.templates.get(key, None)
+        if template_id is not None:
+            return template_id
+
+        template_id = len(self.templates)
+        template = bpy.data.objects.new(f"Template_{template_id:06d}", mesh)
+        if material is not None:
+            if not mesh.materials:
+                mesh.materials.append(None)
+            template.material_slots[0].link = "OBJECT"
+            template.material_slots[0].material = material
+        self.template_collection.objects.link(template)
+        self.templates[key] = template_id
+        return template_id
+
+    def add_instance(self, matrix, template_id, pass_index=0):
+        self.matrices.append(matrix)
+        self.template_ids.append(template_id)
+        self.pass_indices.append(pass_index)
+
+    def add_internode(self, matrix, width, length, material, organ_label=0):
+        """Add an instance of the internode cylinder scaled to width and length"""
+        template_id = self.template_id(get_internode_mesh(), material)
+        self.add_instance(
+            np.asarray(matrix) * (width, width, length, 1),
+            template_id,
+            organ_label,
+        )
+
+    def add_mesh(self, mesh, matrix, organ_label=0):
+        """Add an instance of a Blender mesh"""
+        self.add_instance(matrix, self.template_id(mesh), organ_label)
+
+    def to_mesh(self, name):
+        """Write all points and their attributes into a new Blender mesh"""
+        mesh = bpy.data.meshes.new(name)
+        if len(self) == 0:
+            return mesh
+
+        # Decompose all transforms at once
+        matrices = np.asarray(self.matrices, dtype=float)
+        scales = np.linalg.norm(matrices[:, :3, :3], axis=1)
+        rotations = rotation_quaternions(
+            instance_rotations(matrices[:, :3, :3], scales)
+        )
+
+        mesh.vertices.add(len(self))
+        mesh.vertices.foreach_set("co", matrices[:, :3, 3].astype(np.float32).ravel())
+        attributes = [
+            (ROTATION_ATTRIBUTE, "QUATERNION", rotations, np.float32),
+            (SCALE_ATTRIBUTE, "FLOAT_VECTOR", scales, np.float32),
+            (TEMPLATE_ID_ATTRIBUTE, "INT", self.template_ids, np.int32),
+            (PASS_INDEX_ATTRIBUTE, "INT", self.pass_indices, np.int32),
+        ]
+        for attribute_name, attribute_type, values, dtype in attributes:
+            attribute = mesh.attributes.new(attribute_name, attribute_type, "POINT")
+            key = "value" if attribute_type != "FLOAT_VECTOR" else "vector"
+            attribute.data.foreach_set(key, np.asarray(values, dtype=dtype).ravel())
+
+        mesh.update()
+        return mesh
+
+    def create_object(self, name, collection):
+        """Create the point object with the instancer modifier and link it and its templates to the collection"""
+        self.template_collection.name = f"{name}_templates"
+        collection.children.link(self.template_collection)
+
+        obj = bpy.data.objects.new(name, self.to_mesh(f"{name}_points"))
+        node_group = get_instancer_node_group()
+        modifier = obj.modifiers.new(MODIFIER_NAME, "NODES")
+        modifier.node_group = node_group
+        modifier[node_group.interface.items_tree["Templates"].identifier] = (
+            self.template_collection
+        )
+        collection.objects.link(obj)
+        return obj
@@ -0,0 +1,93 @@
+"""Keep the objects of drawn organs between redraws of different iteration steps.
+
+Organs get a stable identity (plant, organ type, rank), the rank counts the organs of a type in drawing order.
+When a plant is drawn again, the drawer claims the object of the same organ from the previous drawing and only
+writes the values (shape, material, transform, ...) that differ from what was written before. Organs that no
+longer exist are removed when the plant is finished. Objects are looked up by name, references to Blender data
+are not kept between redraws.
+"""
+
+from collections import Counter
+
+import bpy
+
+from .scene_teardown import remove_objects
+
+
+class PlantDiff:
+    """Objects drawn for the organs of one plant and the values last written to them"""
+
+    def __init__(self) -> None:
+        self.organs = {}  # (Organ type, rank) -> (object name, {field: value})
+        self.ranks = Counter()
+        self.visited = set()
+        self.current = None
+        self.created = 0
+        self.reused = 0
+        self.removed = 0
+
+    def begin(self):
+        """Start a new drawing of the plant"""
+        self.ranks.clear()
+        self.visited = set()
+        self.current = None
+        self.created = self.reused = self.removed = 0
+
+    def claim(self, organ_type):
+        """Object of the next organ of a type from the previous drawing, None if it has to be created"""
+        key = (organ_type, self.ranks[organ_type])
+        self.ranks[organ_type] += 1
+        self.visited.add(key)
+
+        organ = self.organs.get(key, None)
+        obj = bpy.data.objects.get(organ[0], None) if organ is not None else None
+        if obj is None:
+            self.current = (key, {})
+            return None
+        self.current = (key, organ[1])
+        self.reused += 1
+        return obj
+
+    def add(self, obj):
+        """Register the object created for the last claimed organ"""
+        key, values = self.current
+        values.clear()
+        self.organs[key] = (obj.name, values)
+        self.created += 1
+
+    def changed(self, field, value):
+        """Whether a value of the last claimed organ differs from the previous drawing, stores the new value"""
+        values = self.current[1]
+        if field in values and values[field] == value:
+            return False
+        values[field] = value
+        return True
+
+    def finish(self):
+        """Remove the objects of organs that were not drawn again"""
+        stale = []
+        for key in [key for key in self.organs if key not in self.visited]:
+            obj = bpy.data.objects.get(self.organs.pop(key)[0], None)
+            if obj is not None:
+                stale.append(obj)
+        remove_objects(stale)
+        self.removed = len(stale)
+
+
+class CanopyDiff:
+    """Organs of all plants of the canopy in lpy_collection, valid as long as the drawing settings do not change"""
+
+    def __init__(self, settings, lstring_states) -> None:
+        self.settings = settings
+        self.lstring_states = lstring_states
+        self.plants = {}  # Plant name -> PlantDiff
+
+    def matches(self, settings, lstring_states):
+        """Whether the drawn canopy can be updated for the given settings and derived plants"""
+        return self.settings == settings and self.lstring_states is lstring_states
+
+    def plant(self, name):
+        plant_diff = self.plants.get(name, None)
+        if plant_diff is None:
+            plant_diff = self.plants[name] = PlantDiff()
+        return plant_diff
@@ -0,0 +1,49 @@
+"""Remove drawn objects together with the data they own in a single batch.
+
+Removing objects one at a time leaves their copied meshes behind as orphans. The data of an object (mesh, camera,
+...) is owned if all of its users are removed with it. Shared data such as cached leaf, head and step meshes is
+never removed here, the mesh caches free their meshes on eviction.
+"""
+
+import bpy
+
+from ..parametric_objects.mesh_cache import is_cached_mesh
+
+
+def owned_data(objects):
+    """Data blocks only used by the given objects"""
+    users = {}  # Data name -> (data, number of users among the objects)
+    for obj in objects:
+        data = obj.data
+        if data is None:
+            continue
+        key = (type(data).__name__, data.name_full)
+        entry = users.get(key, None)
+        users[key] = (data, 1 if entry is None else entry[1] + 1)
+    return [
+        data
+        for data, count in users.values()
+        if not data.use_fake_user and data.users == count and not is_cached_mesh(data)
+    ]
+
+
+def remove_objects(objects, extra_ids=()):
+    """Remove objects, the data only they use and additional data blocks with one batch_remove call"""
+    objects = list(objects)
+    ids = objects + owned_data(objects) + list(extra_ids)
+    if ids:
+        bpy.data.batch_remove(ids)
+
+
+def remove_unused_mesh(mesh):
+    """Remove a mesh that was replaced as object data, unless other objects or a mesh cache still use it"""
+    if mesh.users == 0 and not mesh.use_fake_user and not is_cached_mesh(mesh):
+        bpy.data.meshes.remove(mesh)
+
+
+def remove_collection(collection):
+    """Remove a collection with its child collections, all their objects and the data only these objects use"""
+    remove_objects(
+        collection.all_objects,
+        list(collection.children_recursive) + [collection],
+    )
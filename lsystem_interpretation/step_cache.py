@@ -0,0 +1,40 @@
+"""Merged meshes of already drawn iteration steps.
+
+Drawing a step that was drawn before with the merged backends only links the cached mesh to a new object instead of
+interpreting the lstrings again. Entries are keyed by plant and iteration step and are valid as long as the drawing
+settings and the derived plants (and with them the plant seeds) do not change.
+"""
+
+from ..parametric_objects.mesh_cache import MeshCache
+
+STEP_CACHE_MAX_ENTRIES = 100000
+STEP_MESH_PREFIX = "StepCache"
+
+
+class StepMeshCache(MeshCache):
+    """LRU cache of merged plant and canopy meshes within a memory budget"""
+
+    def __init__(self) -> None:
+        super().__init__(STEP_CACHE_MAX_ENTRIES, STEP_MESH_PREFIX)
+        self.settings = None
+        self.lstring_states = None
+
+    def configure(self, settings, lstring_states, max_bytes):
+        """Drop all entries if settings or plants changed and set the memory budget, a budget of 0 disables caching
+
+        Args:
+            settings (tuple): Drawing settings the meshes are drawn with
+            lstring_states (list): Derivations of all plants of the canopy
+            max_bytes (int): Memory budget of all cached meshes in bytes
+        """
+        if settings != self.settings or lstring_states is not self.lstring_states:
+            self.clear()
+            self.settings = settings
+            self.lstring_states = lstring_states
+        self.max_size = STEP_CACHE_MAX_ENTRIES if max_bytes > 0 else 0
+        self.max_bytes = max_bytes
+        self.evict()
+
+
+# Shared by all drawing operator calls
+step_mesh_cache = StepMeshCache()
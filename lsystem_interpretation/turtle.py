@@ -0,0 +1,94 @@
+"""Turtle state for interpreting lstrings, kept in NumPy arrays.
+
+The turtle position and orientation are relative to the current parent (the last drawn internode), like the
+matrix of the former mathutils based implementation. Rotations are applied in the parent frame and the turtle
+moves along its local x axis. Rotation matrices are cached per angle and axis, a plant only uses a few distinct
+angles. World transforms are only computed when an organ is drawn.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=4096)
+def rotation_matrix(angle_degrees: float, axis: str) -> np.ndarray:
+    """3x3 rotation around the 'X', 'Y' or 'Z' axis, same convention as mathutils.Matrix.Rotation"""
+    angle = np.radians(angle_degrees)
+    c, s = np.cos(angle), np.sin(angle)
+    match axis:
+        case "X":
+            rotation = np.array([[1, 0, 0], [0, c, -s], [0, s, c]])
+        case "Y":
+            rotation = np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+        case "Z":
+            rotation = np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+        case _:
+            raise ValueError(f"Unknown rotation axis '{axis}'")
+    rotation.flags.writeable = False
+    return rotation
+
+
+# Look upwards in Z direction by default
+INITIAL_ROTATION = rotation_matrix(-90.0, "Y")
+INITIAL_ROTATION_INVERSE = INITIAL_ROTATION.T
+ORIGIN = np.zeros(3)
+ORIGIN.flags.writeable = False
+
+
+def transform_matrix(location, rotation, scale=None) -> np.ndarray:
+    """4x4 matrix from a location, a 3x3 rotation and an optional scale per axis"""
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation if scale is None else rotation * np.asarray(scale)
+    matrix[:3, 3] = location
+    return matrix
+
+
+class Turtle:
+    """Position and orientation of the turtle with a stack for branches.
+    Arrays are never modified in place, so pushing a state does not need to copy them.
+    """
+
+    __slots__ = ("position", "orientation", "stack")
+
+    def __init__(self) -> None:
+        self.position = ORIGIN
+        self.orientation = INITIAL_ROTATION
+        self.stack = []
+
+    def reset(self):
+        """Reset to the start of a new parent, keeps the stack"""
+        self.position = ORIGIN
+        self.orientation = INITIAL_ROTATION
+
+    def push(self):
+        self.stack.append((self.position, self.orientation))
+
+    def pop(self):
+        self.position, self.orientation = self.stack.pop()
+
+    def rotate(self, angle_degrees, axis):
+        self.orientation = (
+            rotation_matrix(float(angle_degrees), axis) @ self.orientation
+        )
+
+    def move(self, length):
+        self.position = self.position + length * self.orientation[:, 0]
+
+    def local_rotation(self) -> np.ndarray:
+        """Rotation of an object drawn at the turtle, relative to the parent"""
+        return INITIAL_ROTATION_INVERSE @ self.orientation
+
+    def local_matrix(self, offset=None, rotation=None, scale=None) -> np.ndarray:
+        """Transform of an object drawn at the turtle relative to the parent.
+
+        Args:
+            offset (Vector, optional): Translation added to the turtle position. Defaults to None.
+            rotation (np.ndarray, optional): 3x3 rotation of the object itself. Defaults to None.
+            scale (Vector, optional): Scale of the object in x,y,z direction. Defaults to None.
+        """
+        location = self.position if offset is None else self.position + offset
+        local_rotation = self.local_rotation()
+        if rotation is not None:
+            local_rotation = local_rotation @ rotation
+        return transform_matrix(location, local_rotation, scale)
@@ -8,6 +8,9 @@ from mathutils import Vector, Quaternion
 import json
 import os
 from .. import globals
+from ..lsystem_interpretation.scene_teardown import remove_collection, remove_objects
+from ..lsystem_interpretation.merged_mesh import ORGAN_LABEL_ATTRIBUTE
+from ..lsystem_interpretation.point_instancer import PASS_INDEX_ATTRIBUTE
 from tqdm import tqdm
 import numpy as np
 from PIL import Image
@@ -15,6 +18,10 @@ import shutil
 
 
 CAMERA_NAME = "LPy Camera"  # Camera name used for rendering
+# Pass index of organs without an object of their own (merged and instances backends), combined with IndexOB for the
+# masks
+PASS_INDEX_AOV = "pass_index"
+PASS_INDEX_AOV_NODE = "Pass Index AOV"
 
 
 class CameraRenderOperator(bpy.types.Operator):
@@ -51,17 +58,13 @@ class CameraRenderOperator(bpy.types.Operator):
         # Setup a collection for visualization of all cameras
         old_collection = bpy.data.collections.get("render_cameras_train", None)
         if old_collection is not None:
-            for obj in old_collection.objects:
-                bpy.data.objects.remove(obj, do_unlink=True)
-            bpy.data.collections.remove(old_collection)
+            remove_collection(old_collection)
         train_camera_collection = bpy.data.collections.new("render_cameras_train")
         bpy.context.scene.collection.children.link(train_camera_collection)
 
         old_collection = bpy.data.collections.get("render_cameras_test", None)
         if old_collection is not None:
-            for obj in old_collection.objects:
-                bpy.data.objects.remove(obj, do_unlink=True)
-            bpy.data.collections.remove(old_collection)
+            remove_collection(old_collection)
         test_camera_collection = bpy.data.collections.new("render_cameras_test")
         bpy.context.scene.collection.children.link(test_camera_collection)
 
@@ -138,19 +141,19 @@ class CameraRenderOperator(bpy.types.Operator):
             # Create output directory
             os.makedirs(camera_props.save_path, exist_ok=False)
 
+            # No orphans_purge between frames: redraws free the data they replace and the mesh caches keep their
+            # unused meshes on purpose, a purge would delete them and rebuild every cached organ in the next frame
             camera_props.current_render_mode = RenderMode.TRAIN.value
             for frame in tqdm(
                 range(1, camera_props.train_frames_total + 1),
                 desc="Rendering training images",
             ):
-                bpy.ops.outliner.orphans_purge()
                 render_camera(scene, rendering_camera, frame, mode=RenderMode.TRAIN)
             camera_props.current_render_mode = RenderMode.TEST.value
             for frame in tqdm(
                 range(1, camera_props.test_frames_total + 1),
                 desc="Rendering testing images",
             ):
-                bpy.ops.outliner.orphans_purge()
                 render_camera(scene, rendering_camera, frame, mode=RenderMode.TEST)
 
             # Save colmap format, used for creating colmap data format with known camera poses
@@ -535,9 +538,7 @@ class CameraRenderOperator(bpy.types.Operator):
         """
         # Cleanup all created objects
         if bpy.data.objects.get("CanopyPointCloudMesh") is not None:
-            bpy.data.objects.remove(
-                bpy.data.objects.get("CanopyPointCloudMesh"), do_unlink=True
-            )
+            remove_objects([bpy.data.objects.get("CanopyPointCloudMesh")])
 
         bpy.ops.object.add(type="MESH")
         canopy_mesh = bpy.context.active_object
@@ -601,7 +602,7 @@ class CameraRenderOperator(bpy.types.Operator):
         bpy.context.collection.objects.link(reduced_point_cloud)
 
         # Remove intermediate object
-        bpy.data.objects.remove(bpy.data.objects.get("CanopyMesh"), do_unlink=True)
+        remove_objects([bpy.data.objects.get("CanopyMesh")])
 
 
 def select_all_objects_from_collection(collection_name):
@@ -739,6 +740,9 @@ def render_camera(scene, camera, frame, mode=RenderMode.TRAIN):
     # Enable object index pass
     bpy.context.view_layer.use_pass_object_index = True
 
+    # Enable pass index AOV
+    add_pass_index_aov(bpy.context.view_layer)
+
     # Enable depth pass
     bpy.context.view_layer.use_pass_z = True
 
@@ -758,11 +762,16 @@ def render_camera(scene, camera, frame, mode=RenderMode.TRAIN):
     tree.links.new(render_layers.outputs["Image"], file_output_image.inputs[0])
 
     # Create file output node for object index pass
+    # Merged meshes have pass index 0 and write the pass index of their faces to the AOV instead
+    max_node = tree.nodes.new(type="CompositorNodeMath")
+    max_node.operation = "MAXIMUM"
+    tree.links.new(render_layers.outputs["IndexOB"], max_node.inputs[0])
+    tree.links.new(render_layers.outputs[PASS_INDEX_AOV], max_node.inputs[1])
     # Create math node to divide index pass by 200
     math_node = tree.nodes.new(type="CompositorNodeMath")
     math_node.operation = "DIVIDE"
     math_node.inputs[1].default_value = 65536  # 2^16
-    tree.links.new(render_layers.outputs["IndexOB"], math_node.inputs[0])
+    tree.links.new(max_node.outputs["Value"], math_node.inputs[0])
     file_output_index = tree.nodes.new(type="CompositorNodeOutputFile")
     file_output_index.label = "Index Output"
     file_output_index.base_path = masks_output_path
@@ -808,6 +817,40 @@ def render_camera(scene, camera, frame, mode=RenderMode.TRAIN):
     # Set camera to original in post_render function
 
 
+def add_pass_index_aov(view_layer):
+    """Add the pass index AOV to the view layer and write it from all materials"""
+    if PASS_INDEX_AOV not in view_layer.aovs:
+        aov = view_layer.aovs.add()
+        aov.name = PASS_INDEX_AOV
+        aov.type = "VALUE"
+    for material in bpy.data.materials:
+        if material.use_nodes and material.node_tree is not None:
+            add_pass_index_aov_output(material.node_tree)
+
+
+def add_pass_index_aov_output(node_tree):
+    """Write the organ label of merged meshes or the pass index of instances to the pass index AOV.
+
+    Objects without these attributes write 0.
+    """
+    if PASS_INDEX_AOV_NODE in node_tree.nodes:
+        return
+    organ_label = node_tree.nodes.new(type="ShaderNodeAttribute")
+    organ_label.attribute_type = "GEOMETRY"
+    organ_label.attribute_name = ORGAN_LABEL_ATTRIBUTE
+    instance_pass_index = node_tree.nodes.new(type="ShaderNodeAttribute")
+    instance_pass_index.attribute_type = "INSTANCER"
+    instance_pass_index.attribute_name = PASS_INDEX_ATTRIBUTE
+    max_node = node_tree.nodes.new(type="ShaderNodeMath")
+    max_node.operation = "MAXIMUM"
+    node_tree.links.new(organ_label.outputs["Fac"], max_node.inputs[0])
+    node_tree.links.new(instance_pass_index.outputs["Fac"], max_node.inputs[1])
+    aov_output = node_tree.nodes.new(type="ShaderNodeOutputAOV")
+    aov_output.name = PASS_INDEX_AOV_NODE
+    aov_output.aov_name = PASS_INDEX_AOV
+    node_tree.links.new(max_node.outputs["Value"], aov_output.inputs["Value"])
+
+
 def create_masked_images(image_dir, mask_dir, output_dir):
     """Create images where the background is masked out using the mask images.
 
@@ -2,6 +2,14 @@ import bpy
 import os
 from math import radians
 from ..lsystem_interpretation import draw_lsystem
+from ..lsystem_interpretation.merged_mesh import MeshBuilder
+from ..lsystem_interpretation.point_instancer import PointInstancer
+from ..lsystem_interpretation.scene_diff import CanopyDiff
+from ..lsystem_interpretation.scene_teardown import remove_collection
+from ..lsystem_interpretation.step_cache import step_mesh_cache
+from ..parametric_objects.ground_plane import ground_plane_mesh
+from ..parametric_objects.leaf_cache import leaf_mesh_cache
+from ..parametric_objects.template_library import import_templates
 from .. import globals
 import time
 import numpy as np
@@ -25,27 +33,141 @@ class LSystemDrawingOperator(bpy.types.Operator):
         np.random.seed(props.canopy_seed)
 
         start_time = time.time()
-        lpy_collection = clean_scene(context)
-        for x in range(props.canopy_plants_x):
-            for y in range(props.canopy_plants_y):
-                plant_index = x * props.canopy_plants_y + y
+        lpy_collection, canopy_diff = prepare_canopy_diff(context)
+        leaf_mesh_cache.configure(props.leaf_cache_size, props.leaf_cache_tolerance)
+        step_mesh_cache.configure(
+            drawing_settings(props),
+            globals.global_lstring_states,
+            props.step_cache_budget * 1024 * 1024,
+        )
+
+        root_objects = [
+            create_root_object(x, y, lpy_collection, reuse=canopy_diff is not None)
+            for x in range(props.canopy_plants_x)
+            for y in range(props.canopy_plants_y)
+        ]
+        lstring_states = globals.global_lstring_states
+
+        if props.draw_backend == "merged_canopy":
+            # Merged meshes of steps that were drawn before are taken from the step cache
+            def draw_canopy(name):
+                canopy_builder = MeshBuilder()
+                for plant_index, root_object in enumerate(root_objects):
+                    create_plant(
+                        context,
+                        lstring_states[plant_index].modules(draw_state_index),
+                        root_object,
+                        lpy_collection,
+                        canopy_builder,
+                    )
+                return canopy_builder.to_mesh(name)
+
+            mesh = step_mesh_cache.get(("canopy", draw_state_index), draw_canopy)
+            create_merged_object(f"Canopy_{props.draw_backend}", mesh, lpy_collection)
+        elif props.draw_backend == "merged_plant":
+            for plant_index, root_object in enumerate(root_objects):
+
+                def draw_plant(name):
+                    plant_builder = MeshBuilder()
+                    create_plant(
+                        context,
+                        lstring_states[plant_index].modules(draw_state_index),
+                        root_object,
+                        lpy_collection,
+                        plant_builder,
+                    )
+                    return plant_builder.to_mesh(name)
+
+                mesh = step_mesh_cache.get(
+                    ("plant", plant_index, draw_state_index), draw_plant
+                )
+                create_merged_object(f"{root_object.name}_merged", mesh, lpy_collection)
+        else:
+            canopy_builder = create_canopy_builder(props.draw_backend)
+            for plant_index, root_object in enumerate(root_objects):
                 create_plant(
                     context,
-                    globals.global_lstring_states[plant_index][draw_state_index],
-                    x,
-                    y,
+                    lstring_states[plant_index].modules(draw_state_index),
+                    root_object,
                     lpy_collection,
+                    canopy_builder,
+                    canopy_diff,
+                )
+            if canopy_builder is not None:
+                canopy_builder.create_object(
+                    f"Canopy_{props.draw_backend}", lpy_collection
                 )
         end_time = time.time()
         print(f"Time taken to draw all plants {end_time - start_time} seconds")
         return {"FINISHED"}
 
 
-def create_plant(context, lstring, x, y, lpy_collection):
-    """Draw a single plant of the canopy"""
+def drawing_settings(props):
+    """Settings that change the drawn canopy, apart from the iteration step"""
+    return (
+        props.model,
+        props.canopy_plants_x,
+        props.canopy_plants_y,
+        props.canopy_distance_x,
+        props.canopy_distance_y,
+        props.plant_placement_standard_deviation,
+        props.canopy_seed,
+        props.step_size,
+        props.line_width,
+        props.width_growth_factor,
+        props.draw_backend,
+        props.instance_internodes,
+        props.leaf_cache_size,
+        props.leaf_cache_tolerance,
+    )
+
+
+def prepare_canopy_diff(context):
+    """Keep the drawn canopy if only the iteration step changed since the last drawing, otherwise clean the scene.
+
+    Returns:
+        tuple: Collection of the canopy and the CanopyDiff of its organs, None if the canopy is not redrawn
+            incrementally
+    """
+    props = bpy.context.scene.PlantProps
+    settings = drawing_settings(props)
+    canopy_diff = globals.drawn_canopy
+    lpy_collection = bpy.data.collections.get("lpy_collection", None)
+    if (
+        canopy_diff is not None
+        and props.incremental_redraw
+        and lpy_collection is not None
+        and canopy_diff.matches(settings, globals.global_lstring_states)
+    ):
+        return lpy_collection, canopy_diff
+
+    lpy_collection = clean_scene(context)
+    canopy_diff = None
+    if props.incremental_redraw and props.draw_backend == "objects":
+        canopy_diff = CanopyDiff(settings, globals.global_lstring_states)
+    globals.drawn_canopy = canopy_diff
+    return lpy_collection, canopy_diff
+
+
+def create_canopy_builder(draw_backend):
+    """Builder shared by all plants of the canopy, None if every plant is drawn on its own"""
+    if draw_backend == "merged_canopy":
+        return MeshBuilder()
+    if draw_backend == "instances":
+        return PointInstancer()
+    return None
+
+
+def create_root_object(x, y, lpy_collection, reuse=False):
+    """Root object of the plant at grid position x, y. Reuses the existing root object if reuse is set."""
     props = bpy.context.scene.PlantProps
 
-    root_object = bpy.data.objects.new(f"Plant_{x}_{y}", None)
+    root_object = None
+    if reuse:
+        root_object = bpy.data.objects.get(f"Plant_{x}_{y}", None)
+    if root_object is None:
+        root_object = bpy.data.objects.new(f"Plant_{x}_{y}", None)
+        lpy_collection.objects.link(root_object)
     # Place plant at correct location, (0, 0) is defined as the center of the field
     dx = np.random.normal(loc=0, scale=props.plant_placement_standard_deviation)
     dy = np.random.normal(loc=0, scale=props.plant_placement_standard_deviation)
@@ -55,7 +177,28 @@ def create_plant(context, lstring, x, y, lpy_collection):
         0,
     )
     root_object.location = location
-    lpy_collection.objects.link(root_object)
+    return root_object
+
+
+def create_merged_object(name, mesh, lpy_collection):
+    """Object for a merged mesh of a plant or the canopy"""
+    obj = bpy.data.objects.new(name, mesh)
+    lpy_collection.objects.link(obj)
+    return obj
+
+
+def create_plant(
+    context, lstring, root_object, lpy_collection, mesh_builder=None, canopy_diff=None
+):
+    """Draw a single plant of the canopy below its root object. If a mesh builder is given, the plant is merged
+    into it. With a canopy diff, the objects of the previous drawing of the plant are updated instead of replaced.
+    """
+    props = bpy.context.scene.PlantProps
+
+    plant_diff = None
+    if canopy_diff is not None:
+        plant_diff = canopy_diff.plant(root_object.name)
+        plant_diff.begin()
 
     draw_lsystem.interpret(
         lstring,
@@ -65,7 +208,12 @@ def create_plant(context, lstring, x, y, lpy_collection):
         props.line_width,
         props.width_growth_factor,
         globals.plant_models[props.model][1],
+        instance_internodes=props.instance_internodes,
+        mesh_builder=mesh_builder,
+        scene_diff=plant_diff,
     )
+    if plant_diff is not None:
+        plant_diff.finish()
 
 
 def clean_scene(context):
@@ -81,9 +229,7 @@ def clean_scene(context):
     # Remove previous collection and all its objects
     old_collection = bpy.data.collections.get("lpy_collection", None)
     if old_collection is not None:
-        for obj in old_collection.objects:
-            bpy.data.objects.remove(obj, do_unlink=True)
-        bpy.data.collections.remove(old_collection)
+        remove_collection(old_collection)
     else:
         # In first run import template objects
         import_template_objects(context)
@@ -93,46 +239,45 @@ def clean_scene(context):
     lpy_collection = bpy.data.collections.new("lpy_collection")
     bpy.context.scene.collection.children.link(lpy_collection)
 
-    # Create a plane with x nodes
+    # Ground plane with a fine grid below the canopy and the cameras, the mesh is shared between drawings
     if bpy.data.objects.get("GroundPlane", None) is None:
-        bpy.ops.mesh.primitive_plane_add(
-            size=5000, enter_editmode=True, align="WORLD", location=(0, 0, 0)
-        )
-        bpy.ops.mesh.subdivide(number_cuts=1000)
-        plane = bpy.context.object
-
-        # Select the middle part of the plane
-        bpy.ops.mesh.select_all(action="DESELECT")
-
-        bpy.ops.object.mode_set(mode="OBJECT")
-
-        radius = 200
-        for vertice in plane.data.vertices:
-            if -radius < vertice.co.x < radius and -radius < vertice.co.y < radius:
-                vertice.select = True
-        bpy.ops.object.mode_set(mode="EDIT")
-
-        # Subdivide the middle part more
-        bpy.ops.mesh.subdivide(number_cuts=5000)
-        bpy.ops.object.mode_set(mode="OBJECT")
-        plane.name = "GroundPlane"
+        mesh = ground_plane_mesh(ground_dense_half_size(context), "Field")
+        plane = bpy.data.objects.new("GroundPlane", mesh)
         lpy_collection.objects.link(plane)
-        plane.data.materials.append(bpy.data.materials.get("Field", None))
 
     return lpy_collection
 
 
+def ground_dense_half_size(context):
+    """Half size of the ground square that needs the finest grid, covers the canopy and the camera spheres"""
+    props = context.scene.PlantProps
+    camera_props = context.scene.CameraRenderProps
+    # Plants are placed around the center of the field with some random offset
+    canopy_half_size = (
+        max(
+            props.canopy_plants_x * props.canopy_distance_x,
+            props.canopy_plants_y * props.canopy_distance_y,
+        )
+        / 2
+        + 3 * props.plant_placement_standard_deviation
+    )
+    camera_half_size = max(
+        camera_props.radius_train + max(map(abs, camera_props.center_train[:2])),
+        camera_props.radius_test + max(map(abs, camera_props.center_test[:2])),
+    )
+    return max(canopy_half_size, camera_half_size)
+
+
 def clean_scene_and_render(context, lstring):
     """Remove previous results from scene and draw lsystem"""
 
     props = bpy.context.scene.PlantProps
 
     # Remove previous collection and all its objects
+    globals.drawn_canopy = None
     old_collection = bpy.data.collections.get("lpy_collection", None)
     if old_collection is not None:
-        for obj in old_collection.objects:
-            bpy.data.objects.remove(obj, do_unlink=True)
-        bpy.data.collections.remove(old_collection)
+        remove_collection(old_collection)
     else:
         import_template_objects(context)
 
@@ -142,6 +287,11 @@ def clean_scene_and_render(context, lstring):
     root_object = bpy.data.objects.new("Root", None)
     lpy_collection.objects.link(root_object)
 
+    leaf_mesh_cache.configure(props.leaf_cache_size, props.leaf_cache_tolerance)
+    mesh_builder = create_canopy_builder(props.draw_backend)
+    if props.draw_backend == "merged_plant":
+        mesh_builder = MeshBuilder()
+
     draw_lsystem.interpret(
         lstring,
         lpy_collection,
@@ -150,21 +300,18 @@ def clean_scene_and_render(context, lstring):
         props.line_width,
         props.width_growth_factor,
         globals.plant_models[props.model][1],
+        instance_internodes=props.instance_internodes,
+        mesh_builder=mesh_builder,
     )
+    if mesh_builder is not None:
+        mesh_builder.create_object(f"Root_{props.draw_backend}", lpy_collection)
 
 
 def import_template_objects(context):
-    """Import all objects from the 'template_objects' folder"""
+    """Import all objects from the 'template_objects' folder, appended from its .blend library if it is current"""
     extension_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     template_directory = os.path.join(extension_folder, "template_objects")
-    obj_files = [
-        f
-        for f in os.listdir(template_directory)
-        if f.endswith(".obj") and os.path.isfile(os.path.join(template_directory, f))
-    ]
-
-    for obj_file in obj_files:
-        bpy.ops.wm.obj_import(filepath=os.path.join(template_directory, obj_file))
+    import_templates(template_directory, context.collection)
 
     # Hide objects
     object_names = ["WheatOriginal"]
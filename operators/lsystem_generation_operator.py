@@ -1,6 +1,7 @@
 import bpy
 import random
 from .. import globals
+from ..lsystem_generation import canopy_generation
 
 
 class LSystemGeneratorOperator(bpy.types.Operator):
@@ -29,12 +30,21 @@ class LSystemGeneratorOperator(bpy.types.Operator):
             for _ in range(props.canopy_plants_x * props.canopy_plants_y)
         ]
 
-        # Generate the L-System for each plant while keeping track of plant part indices
+        # Set up the L-System for each plant while keeping track of plant part indices
         mask_indices = {}
         current_mask_index = 1
-        all_plant_lstrings = []
+        plants = []
         for plant_index in range(props.canopy_plants_x * props.canopy_plants_y):
-            lstring, current_mask_index, mask_indices = globals.plant_models[
+            # Grammars draw random values, keep the state so workers can set up the same grammar
+            random_state = random.getstate()
+            grammar_args = (
+                props.derivation_length,
+                plant_seeds[plant_index],
+                current_mask_index,
+                {},
+                plant_index,
+            )
+            lsystem, current_mask_index, mask_indices = globals.plant_models[
                 props.model
             ][0](
                 props.derivation_length,
@@ -43,7 +53,17 @@ class LSystemGeneratorOperator(bpy.types.Operator):
                 mask_indices,
                 plant_index,
             )
-            all_plant_lstrings.append(lstring)
+            plants.append((lsystem, grammar_args, random_state))
+
+        # Derive all plants, only checkpoint states are kept and lstrings are interpreted when a step is drawn
+        all_plant_lstrings = canopy_generation.derive_canopy(
+            plants,
+            globals.plant_grammars[props.model],
+            checkpoint_interval=props.state_checkpoint_interval,
+            parallel=props.parallel_generation,
+            workers=props.generation_workers,
+            cache_directory=bpy.path.abspath(props.generation_cache_directory),
+        )
         globals.global_lstring_states = all_plant_lstrings
         globals.plant_labels = mask_indices
         globals.max_plant_label = current_mask_index - 1
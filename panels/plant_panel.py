@@ -29,6 +29,11 @@ class Plant3DPanel(bpy.types.Panel):
         layout.prop(props, "canopy_plants_y")
         layout.prop(props, "derivation_length")
         layout.prop(props, "canopy_seed")
+        layout.prop(props, "state_checkpoint_interval")
+        layout.prop(props, "parallel_generation")
+        if props.parallel_generation:
+            layout.prop(props, "generation_workers")
+        layout.prop(props, "generation_cache_directory")
         layout.operator(LSystemGeneratorOperator.bl_idname)
 
         # Allow the user to set canopy parameters
@@ -36,6 +41,15 @@ class Plant3DPanel(bpy.types.Panel):
         layout.prop(props, "canopy_distance_x")
         layout.prop(props, "canopy_distance_y")
         layout.prop(props, "plant_placement_standard_deviation")
+        layout.prop(props, "draw_backend")
+        if props.draw_backend == "objects":
+            layout.prop(props, "instance_internodes")
+            layout.prop(props, "incremental_redraw")
+        elif props.draw_backend in ["merged_plant", "merged_canopy"]:
+            layout.prop(props, "step_cache_budget")
+        layout.prop(props, "leaf_cache_size")
+        if props.leaf_cache_size > 0:
+            layout.prop(props, "leaf_cache_tolerance")
 
         # Allow the user to select a specific iteration step of the lstring derivation
         if len(globals.global_lstring_states) > 0:
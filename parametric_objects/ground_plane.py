@@ -0,0 +1,210 @@
+"""Ground plane with a graded resolution, dense only below the canopy and the cameras.
+
+The dense square in the center is surrounded by bands whose grid spacing doubles from band to band. Faces of a band
+that border the finer grid inside get the middle vertex of the shared edge as fifth vertex, so the mesh has no
+T-junctions. Grids are built with NumPy on an integer lattice and cached on disk between sessions and pipeline runs.
+"""
+
+import hashlib
+import os
+import tempfile
+from math import ceil
+
+import bpy
+import numpy as np
+
+from .mesh_cache import MeshCache
+
+GROUND_FORMAT_VERSION = 1
+GROUND_SIZE = 5000
+GROUND_SPACING = 0.5
+# Grid spacing is increased for larger dense squares to keep the number of faces bounded
+GROUND_MAX_DENSE_CELLS = 1000
+GROUND_BAND_CELLS = 16
+GROUND_MESH_PREFIX = "GroundPlane"
+GROUND_CACHE_SIZE = 4
+
+# Ground meshes by grid and material, shared between drawings
+ground_mesh_cache = MeshCache(GROUND_CACHE_SIZE, GROUND_MESH_PREFIX)
+
+
+def ground_cache_directory():
+    """Directory of cached ground grids, the user directory of the extension or the temporary directory"""
+    package = __package__.rpartition(".")[0]
+    try:
+        return bpy.utils.extension_path_user(package, path="ground", create=True)
+    except (AttributeError, ValueError):
+        directory = os.path.join(tempfile.gettempdir(), "lsystem_ground")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+
+def ground_layout(dense_half_size, size=GROUND_SIZE):
+    """Lattice unit and band edges of a ground plane, the dense square covers at least dense_half_size.
+
+    Returns:
+        tuple: Lattice unit (spacing of the dense grid) and a list of (inner, outer, spacing) of the dense square
+            and all bands in lattice units
+    """
+    unit = GROUND_SPACING
+    while 2 * dense_half_size / unit > GROUND_MAX_DENSE_CELLS:
+        unit *= 2
+    half_size = ceil(size / 2 / unit)
+
+    # Band edges are multiples of the spacing of the next band
+    outer = min(2 * ceil(dense_half_size / unit / 2), half_size)
+    bands = [(0, outer, 1)]
+    spacing = 1
+    while outer < half_size:
+        spacing *= 2
+        inner = outer
+        outer = min(
+            2 * spacing * ceil((inner + GROUND_BAND_CELLS * spacing) / (2 * spacing)),
+            spacing * ceil(half_size / spacing),
+        )
+        bands.append((inner, outer, spacing))
+    return unit, bands
+
+
+def ground_grid(bands):
+    """Polygons of the graded grid on the integer lattice.
+
+    Args:
+        bands (list): (inner, outer, spacing) of the dense square and all bands from ground_layout()
+
+    Returns:
+        tuple: Lattice coordinates of the vertices (V, 2), loop vertex indices (L,) and polygon sizes (P,)
+    """
+    loop_points = []
+    polygon_sizes = []
+    for inner, outer, spacing in bands:
+        edges = np.arange(-outer, outer, spacing)
+        x0, y0 = (a.ravel() for a in np.meshgrid(edges, edges, indexing="ij"))
+        x1 = x0 + spacing
+        y1 = y0 + spacing
+        keep = (x0 >= inner) | (x1 <= -inner) | (y0 >= inner) | (y1 <= -inner)
+        if inner == 0:
+            keep[:] = True
+        x0, y0, x1, y1 = x0[keep], y0[keep], x1[keep], y1[keep]
+        xm = (x0 + x1) // 2
+        ym = (y0 + y1) // 2
+
+        # Corners in counterclockwise order with the edge middles in between
+        slots = np.stack(
+            [
+                np.stack([x0, y0], -1),
+                np.stack([xm, y0], -1),
+                np.stack([x1, y0], -1),
+                np.stack([x1, ym], -1),
+                np.stack([x1, y1], -1),
+                np.stack([xm, y1], -1),
+                np.stack([x0, y1], -1),
+                np.stack([x0, ym], -1),
+            ],
+            1,
+        )
+        used = np.zeros((len(x0), 8), dtype=bool)
+        used[:, 0::2] = True
+        if inner > 0:
+            along_x = (x0 >= -inner) & (x1 <= inner)
+            along_y = (y0 >= -inner) & (y1 <= inner)
+            used[:, 1] = along_x & (y0 == inner)
+            used[:, 3] = along_y & (x1 == -inner)
+            used[:, 5] = along_x & (y1 == -inner)
+            used[:, 7] = along_y & (x0 == inner)
+        loop_points.append(slots[used])
+        polygon_sizes.append(used.sum(1))
+
+    # Merge the vertices shared between polygons and bands by their packed lattice coordinates
+    loop_points = np.concatenate(loop_points).astype(np.int64)
+    offset = bands[-1][1]
+    packed = (
+        (loop_points[:, 0] + offset) * (2 * offset + 1) + loop_points[:, 1] + offset
+    )
+    packed_vertices, loop_vertices = np.unique(packed, return_inverse=True)
+    vertices = np.stack(np.divmod(packed_vertices, 2 * offset + 1), -1) - offset
+    return (
+        vertices.astype(np.int32),
+        loop_vertices.astype(np.int32),
+        np.concatenate(polygon_sizes).astype(np.int32),
+    )
+
+
+def ground_cache_key(unit, bands):
+    key = (GROUND_FORMAT_VERSION, unit, tuple(bands))
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+def load_ground_grid(cache_directory, key, bands):
+    """Grid of the ground plane from the disk cache, built and stored if there is no valid entry"""
+    path = os.path.join(cache_directory, f"ground_{key}.npz")
+    if os.path.isfile(path):
+        try:
+            with np.load(path) as data:
+                return data["vertices"], data["loop_vertices"], data["polygon_sizes"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring invalid ground cache file {path}: {e}")
+
+    vertices, loop_vertices, polygon_sizes = ground_grid(bands)
+    # Write to a temporary file first, concurrent pipeline runs never read partial entries
+    temporary_path = f"{path}.{os.getpid()}.tmp.npz"
+    try:
+        np.savez(
+            temporary_path,
+            vertices=vertices,
+            loop_vertices=loop_vertices,
+            polygon_sizes=polygon_sizes,
+        )
+        os.replace(temporary_path, path)
+    except OSError as e:
+        print(f"Could not store ground cache file {path}: {e}")
+    return vertices, loop_vertices, polygon_sizes
+
+
+def create_ground_plane_mesh(name, unit, bands, key, material_name=None):
+    """Mesh of the graded grid from ground_layout(), the grid is read from the disk cache"""
+    vertices, loop_vertices, polygon_sizes = load_ground_grid(
+        ground_cache_directory(), key, bands
+    )
+    coordinates = np.zeros((len(vertices), 3), dtype=np.float32)
+    coordinates[:, :2] = vertices * unit
+    loop_starts = np.zeros(len(polygon_sizes), dtype=np.int32)
+    np.cumsum(polygon_sizes[:-1], out=loop_starts[1:])
+    # Same uvs as a subdivided plane, the whole plane covers the unit square
+    extent = 2 * bands[-1][1] * unit
+    loop_uvs = coordinates[loop_vertices, :2] / extent + 0.5
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(coordinates))
+    mesh.vertices.foreach_set("co", coordinates.ravel())
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set("vertex_index", loop_vertices)
+    mesh.polygons.add(len(polygon_sizes))
+    mesh.polygons.foreach_set("loop_start", loop_starts)
+    mesh.update(calc_edges=True)
+    uv_layer = mesh.uv_layers.new(name="UVMap")
+    uv_layer.data.foreach_set("uv", loop_uvs.ravel())
+
+    material = bpy.data.materials.get(material_name, None) if material_name else None
+    if material is not None:
+        mesh.materials.append(material)
+    return mesh
+
+
+def ground_plane_mesh(dense_half_size, material_name=None, size=GROUND_SIZE):
+    """Mesh of the ground plane, shared between drawings through ground_mesh_cache.
+
+    Args:
+        dense_half_size (float): Half size of the square around the origin with the finest grid
+        material_name (str, optional): Material of the ground. Defaults to None.
+        size (float, optional): Size of the whole plane. Defaults to GROUND_SIZE.
+
+    Returns:
+        bpy.types.Mesh: Ground plane mesh
+    """
+    unit, bands = ground_layout(dense_half_size, size)
+    key = ground_cache_key(unit, bands)
+    return ground_mesh_cache.get(
+        (key, material_name),
+        lambda name: create_ground_plane_mesh(name, unit, bands, key, material_name),
+    )
@@ -1,9 +1,10 @@
+from functools import lru_cache
+
 import numpy as np
-from .spline import Spline2D
+from .spline import Spline2D, shared_spline
 import bpy
-from mathutils import Vector, Quaternion
 import random
-from math import radians, sin, cos, sqrt
+from math import radians, sqrt
 
 
 def create_curve(curvature=0.5):
@@ -29,8 +30,8 @@ def get_generic_control_points(curve: Spline2D, axis="y", segments=10):
         _type_: list of control points. Each point is a tuple of (x,y,z) coordinates
     """
     all_points = []
-    for i in range(0, segments + 1):
-        x, y = curve.evaluate(i * (1 / segments))
+    xs, ys = curve.evaluate_many(np.arange(segments + 1) * (1 / segments))
+    for x, y in zip(xs, ys):
         if axis == "y":
             all_points.append((x, 0, y))
         elif axis == "x":
@@ -43,34 +44,33 @@ def blend_value(a, b, alpha):
     return alpha * a + (1.0 - alpha) * b
 
 
-def blend_contour_with_cylinder(contour: Spline2D, alpha: float, segments: int):
-    points = []
-    for i in range(segments + 1):
-        contour_point_x, contour_point_y = contour.evaluate(i * (1.0 / segments))
-        contour_point_x -= 0.5
+def blend_contour_with_cylinder(contour: Spline2D, alpha, segments: int):
+    """Blend the contour with a unit circle. Alpha can be an array (N, 1) to blend for N positions at once.
+
+    Returns:
+        tuple: x and y coordinates of the blended contour points, shape (segments + 1,) or (N, segments + 1)
+    """
+    indices = np.arange(segments + 1)
+    contour_points_x, contour_points_y = contour.evaluate_many(
+        indices * (1.0 / segments)
+    )
+    contour_points_x = contour_points_x - 0.5
 
-        cylinder_angle = np.pi / 2.0 + i * (2 * np.pi / segments)
-        cylinder_point_x = cos(cylinder_angle)
-        cylinder_point_y = sin(cylinder_angle)
+    cylinder_angles = np.pi / 2.0 + indices * (2 * np.pi / segments)
+    cylinder_points_x = np.cos(cylinder_angles)
+    cylinder_points_y = np.sin(cylinder_angles)
 
-        points.append(
-            (
-                blend_value(contour_point_x, cylinder_point_x, alpha),
-                blend_value(contour_point_y, cylinder_point_y, alpha),
-            )
-        )
-    return points
+    return (
+        blend_value(contour_points_x, cylinder_points_x, alpha),
+        blend_value(contour_points_y, cylinder_points_y, alpha),
+    )
 
 
 def blend_contours(a, b, alpha, segments=10):
-    points = []
-    for i in range(segments + 1):
-        a_x, a_y = a.evaluate(i * (1.0 / segments))
-        b_x, b_y = b.evaluate(i * (1.0 / segments))
-        blended_x = blend_value(a_x, b_x, alpha)
-        blended_y = blend_value(a_y, b_y, alpha)
-        points.append((blended_x, blended_y))
-    return points
+    positions = np.arange(segments + 1) * (1.0 / segments)
+    a_x, a_y = a.evaluate_many(positions)
+    b_x, b_y = b.evaluate_many(positions)
+    return list(zip(blend_value(a_x, b_x, alpha), blend_value(a_y, b_y, alpha)))
 
 
 # TODO: Rename function to reasonable name
@@ -99,64 +99,55 @@ def get_control_points(
         countour_segments (int, optional): How many segments the leaf contour consists of (direction of width). Defaults to 20.
 
     Returns:
-        _type_: Two lists of control points. Each point is a tuple of (x,y,z) coordinates
+        np.ndarray: Points of all contours, shape (segments + 1, contour_segments + 1, 3)
     """
 
-    # Iterate in length through whole leaf
-    all_contours = []
-    for i in range(0, segments + 1):
-        current_position = i * (1.0 / segments)
-        # Get basic center point for current leaf
-        base_point_x, base_point_z, angle_vertical_rotation = (
-            leaf_vertical_curve.evaluate_with_tangent(current_position)
-        )
-        _, base_point_y, angle_horizontal_rotation = (
-            leaf_horizontal_curve.evaluate_with_tangent(current_position)
-        )
-        base_point_x *= length
-        base_point_y *= length
-        base_point_z *= length
-
-        # Get basic parameters for this contour
-        alpha = blend_contour.evaluate(current_position)[1]
-        if (i < 2) and internode_width is not None:
-            radius = (
-                internode_width * 2
-            )  # Set to internode width to match radius of stem
-        elif i == 2:
-            radius = (
-                max(leaf_profile.evaluate(current_position)[1] * width, 0.01)
-                + internode_width * 2
-            ) / 2.0
-        else:
-            radius = max(leaf_profile.evaluate(current_position)[1] * width, 0.01)
-        rotation_angle = leaf_rotation.evaluate(current_position)[1]
-
-        # Calculate all points for current contour
-        current_contour = []
-        contour_points = blend_contour_with_cylinder(contour, alpha, contour_segments)
-        for x, y in contour_points:
-            x_rotated = cos(rotation_angle) * x - sin(rotation_angle) * y
-            y_rotated = sin(rotation_angle) * x + cos(rotation_angle) * y
-
-            # Align contour to leaf direction
-            # Not an ideal solution yet, since order of rotations matter
-            tmp_point = Vector((0, x_rotated * radius, y_rotated * radius))
-            quat = Quaternion((0, 1, 0), -angle_vertical_rotation) @ Quaternion(
-                (0, 0, 1), angle_horizontal_rotation
-            )
-            final = quat @ tmp_point
-
-            final_x = final[0]
-            final_y = final[1]
-            final_z = final[2]
-
-            current_contour.append(
-                (base_point_x + final_x, base_point_y + final_y, base_point_z + final_z)
-            )
-        all_contours.append(current_contour)
-
-    return all_contours
+    # Evaluate all curves for all positions along the leaf at once
+    positions = np.arange(segments + 1) * (1.0 / segments)
+    base_points_x, base_points_z, angles_vertical_rotation = (
+        leaf_vertical_curve.evaluate_with_tangent_many(positions)
+    )
+    _, base_points_y, angles_horizontal_rotation = (
+        leaf_horizontal_curve.evaluate_with_tangent_many(positions)
+    )
+    base_points = np.stack([base_points_x, base_points_y, base_points_z], axis=1)
+    base_points *= length
+
+    # Get basic parameters for all contours
+    alpha = blend_contour.evaluate_many(positions)[1]
+    radius = np.maximum(leaf_profile.evaluate_many(positions)[1] * width, 0.01)
+    if internode_width is not None:
+        # Match radius of stem at the base of the leaf
+        radius[:2] = internode_width * 2
+        radius[2] = (radius[2] + internode_width * 2) / 2.0
+    rotation_angle = leaf_rotation.evaluate_many(positions)[1]
+
+    # Contour points of every segment (S, C), the contour curve is evaluated once
+    x, y = blend_contour_with_cylinder(contour, alpha[:, None], contour_segments)
+    cos_rotation = np.cos(rotation_angle)[:, None]
+    sin_rotation = np.sin(rotation_angle)[:, None]
+    x_rotated = (cos_rotation * x - sin_rotation * y) * radius[:, None]
+    y_rotated = (sin_rotation * x + cos_rotation * y) * radius[:, None]
+
+    # Align contour to leaf direction, rotate point (0, x, y) around z by the horizontal angle
+    # and then around y by the negative vertical angle
+    # Not an ideal solution yet, since order of rotations matter
+    cos_horizontal = np.cos(angles_horizontal_rotation)[:, None]
+    sin_horizontal = np.sin(angles_horizontal_rotation)[:, None]
+    cos_vertical = np.cos(-angles_vertical_rotation)[:, None]
+    sin_vertical = np.sin(-angles_vertical_rotation)[:, None]
+    horizontal_x = -sin_horizontal * x_rotated
+    horizontal_y = cos_horizontal * x_rotated
+
+    final = np.stack(
+        [
+            cos_vertical * horizontal_x + sin_vertical * y_rotated,
+            horizontal_y,
+            -sin_vertical * horizontal_x + cos_vertical * y_rotated,
+        ],
+        axis=2,
+    )
+    return base_points[:, None, :] + final
 
 
 def create_blender_bezier_curve(control_points, object_name="BezierCurve"):
@@ -229,49 +220,62 @@ def interpolate_arrays(array1, array2, alpha):
     return (1 - alpha) * array1 + alpha * array2
 
 
-def create_wheat_leaf(
+def wheat_leaf_parameters(rank, seed):
+    """Random choices of a wheat leaf, drawn in the same order as when the leaf is created.
+
+    Returns:
+        tuple: Whether the leaf is a lower leaf, index of the young and of the senescent vertical curve,
+            horizontal bend in [-1, 1] and twist in [-1.5 pi, 1.5 pi] of a fully grown leaf
+    """
+    random.seed(seed * (rank + 1))
+    lower = rank < 4
+    senescence_curves = (
+        wheat_vertical_curves_lower if lower else wheat_vertical_curves_upper
+    )
+    curve_young_index = random.sample(range(len(wheat_young_curves)), 1)[0]
+    curve_senescence_index = random.sample(range(len(senescence_curves)), 1)[0]
+    horizontal = random.uniform(-1, 1)
+    final_rotation = random.uniform(-1.5 * np.pi, 1.5 * np.pi)
+    return lower, curve_young_index, curve_senescence_index, horizontal, final_rotation
+
+
+def wheat_leaf_shape(length, horizontal, final_rotation):
+    """Horizontal bend and twist of a wheat leaf, both grow with the leaf length"""
+    final_length = 30  # TODO: Get this as argument of function
+
+    horizontal *= (float(length) / final_length) * 0.1
+    final_rotation *= float(length) / final_length
+    return horizontal, final_rotation
+
+
+def create_wheat_leaf_mesh(
     max_width,
     length,
-    curvature,
-    orientation,
+    senescence,
+    internode_width,
+    lower,
+    curve_young_index,
+    curve_senescence_index,
+    horizontal,
+    final_rotation,
     name,
-    rank,
-    seed,
     material_name=None,
-    internode_width=1,
-    senescence=1,
 ):
-    random.seed(seed * (rank + 1))
-
-    leaf_vertical_curve = create_curve(curvature)
+    """Create the mesh of a wheat leaf from the parameters drawn by wheat_leaf_parameters().
+    Horizontal bend and twist are already scaled to the leaf length by wheat_leaf_shape()."""
 
     # Interpolate between upright young leaves and flatter senescent leaves
-    if rank < 4:
-        # Lower leaves
-        curve_young_index = random.sample(range(len(wheat_young_curves)), 1)[0]
-        curve_senescence_index = random.sample(
-            range(len(wheat_vertical_curves_lower)), 1
-        )[0]
-        wheat_curve = interpolate_arrays(
-            wheat_young_curves[curve_young_index],
-            wheat_vertical_curves_lower[curve_senescence_index],
-            senescence,
-        )
-        leaf_vertical_curve = Spline2D(wheat_curve)
-    else:
-        # Upper leaves
-        curve_young_index = random.sample(range(len(wheat_young_curves)), 1)[0]
-        curve_senescence_index = random.sample(
-            range(len(wheat_vertical_curves_upper)), 1
-        )[0]
-        wheat_curve = interpolate_arrays(
-            wheat_young_curves[curve_young_index],
-            wheat_vertical_curves_upper[curve_senescence_index],
-            senescence,
-        )
-        leaf_vertical_curve = Spline2D(wheat_curve)
+    senescence_curves = (
+        wheat_vertical_curves_lower if lower else wheat_vertical_curves_upper
+    )
+    wheat_curve = interpolate_arrays(
+        wheat_young_curves[curve_young_index],
+        senescence_curves[curve_senescence_index],
+        senescence,
+    )
+    leaf_vertical_curve = Spline2D(wheat_curve)
 
-    leaf_profile = Spline2D(
+    leaf_profile = shared_spline(
         np.array(
             [
                 [0, 0.5],
@@ -285,16 +289,10 @@ def create_wheat_leaf(
         ),
     )
 
-    final_length = 30  # TODO: Get this as argument of function
-
-    horizontal = random.uniform(-1, 1)
-    horizontal *= (float(length) / final_length) * 0.1
     leaf_horizontal_curve = Spline2D(
         np.array([[0, 0], [0.33, 0], [0.66, horizontal * 2.0 / 3.0], [1, horizontal]])
     )
 
-    final_rotation = random.uniform(-1.5 * np.pi, 1.5 * np.pi)
-    final_rotation *= float(length) / final_length
     leaf_rotation = Spline2D(
         np.array(
             [
@@ -306,16 +304,15 @@ def create_wheat_leaf(
         )
     )
 
-    leaf_contour = Spline2D(np.array([[0, 0], [0.4, -0.1], [0.6, -0.1], [1, 0]]))
-    blend_contour = Spline2D(np.array([[0, 0.6], [0.05, 1], [0.2, 1], [1, 1]]))
-    create_leaf(
+    leaf_contour = shared_spline(np.array([[0, 0], [0.4, -0.1], [0.6, -0.1], [1, 0]]))
+    blend_contour = shared_spline(np.array([[0, 0.6], [0.05, 1], [0.2, 1], [1, 1]]))
+    return create_leaf_mesh(
         leaf_vertical_curve,
         leaf_horizontal_curve,
         leaf_profile,
         leaf_rotation,
         leaf_contour,
         blend_contour,
-        orientation,
         max_width,
         length,
         name,
@@ -324,13 +321,14 @@ def create_wheat_leaf(
     )
 
 
-def create_maize_leaf(
-    max_width, length, curvature, orientation, name, rank, seed, material_name=None
+def create_maize_leaf_mesh(
+    max_width, length, curvature, rank, seed, name, material_name=None
 ):
+    """Create the mesh of a maize leaf, the random shape is drawn from seed and rank"""
     random.seed(seed * (rank + 1))
 
     leaf_vertical_curve = create_curve(curvature)
-    leaf_profile = Spline2D(
+    leaf_profile = shared_spline(
         np.array(
             [
                 [0, 0.1],
@@ -360,18 +358,17 @@ def create_maize_leaf(
     ]
     leaf_rotation = Spline2D(np.column_stack((rotation_x, rotation_y)))
 
-    leaf_contour = Spline2D(np.array([[0, 0], [0.4, -0.2], [0.6, -0.2], [1, 0]]))
-    blend_contour = Spline2D(
+    leaf_contour = shared_spline(np.array([[0, 0], [0.4, -0.2], [0.6, -0.2], [1, 0]]))
+    blend_contour = shared_spline(
         np.array([[0, 0], [0.01, 0.9], [0.05, 0.9], [0.1, 1], [0.2, 1], [1, 1]])
     )
-    create_leaf(
+    return create_leaf_mesh(
         leaf_vertical_curve,
         leaf_horizontal_curve,
         leaf_profile,
         leaf_rotation,
         leaf_contour,
         blend_contour,
-        orientation,
         max_width,
         length,
         name,
@@ -380,21 +377,48 @@ def create_maize_leaf(
     )
 
 
-def create_leaf(
+@lru_cache(maxsize=32)
+def get_leaf_topology(rows, columns):
+    """Quad faces and uvs of a leaf grid with rows x columns vertices, computed once per resolution.
+
+    Returns:
+        tuple: Loop vertex indices (L,), loop starts (P,), loop uvs (L*2,) and smooth flags (P,)
+    """
+    i, j = np.meshgrid(np.arange(rows - 1), np.arange(columns - 1), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    first = i * columns + j
+    loop_vertices = np.stack(
+        [first, first + 1, first + columns + 1, first + columns], axis=1
+    ).astype(np.int32)
+    loop_starts = 4 * np.arange(len(first), dtype=np.int32)
+
+    u, u_next = j / (columns - 1), (j + 1) / (columns - 1)
+    v, v_next = i / (rows - 1), (i + 1) / (rows - 1)
+    loop_uvs = np.stack([u, v, u_next, v, u_next, v_next, u, v_next], axis=1).astype(
+        np.float32
+    )
+    smooth = np.ones(len(first), dtype=bool)
+
+    loop_vertices, loop_uvs = loop_vertices.ravel(), loop_uvs.ravel()
+    for array in (loop_vertices, loop_starts, loop_uvs, smooth):
+        array.flags.writeable = False
+    return loop_vertices, loop_starts, loop_uvs, smooth
+
+
+def create_leaf_mesh(
     leaf_vertical_curve,
     leaf_horizontal_curve,
     leaf_profile,
     leaf_rotation,
     leaf_contour,
     blend_contour,
-    orientation,
     width,
     length,
     name,
     material_name=None,
     internode_width=1,
 ):
-    """Create 3D leaf based on B-Spline parameterization"""
+    """Create the mesh of a 3D leaf based on B-Spline parameterization"""
 
     control_point_segments = get_control_points(
         leaf_vertical_curve,
@@ -408,70 +432,83 @@ def create_leaf(
         internode_width=internode_width,
     )
 
-    # Put all points in one list
-    all_points = []
-    for segment in control_point_segments:
-        all_points.extend(segment)
-
-    # Create faces
-    total_segments_length = len(control_point_segments)
-    total_segments_width = len(control_point_segments[0])
-
-    all_faces = []
-    all_uvs = []
-    for i in range(0, total_segments_length - 1):
-        for j in range(0, total_segments_width - 1):
-            all_faces.append(
-                [
-                    i * total_segments_width + j,
-                    i * total_segments_width + j + 1,
-                    (i + 1) * total_segments_width + j + 1,
-                    (i + 1) * total_segments_width + j,
-                ]
-            )
-            tsw = total_segments_width - 1
-            tsl = total_segments_length - 1
-            all_uvs.append(
-                [
-                    (j / tsw, i / tsl),
-                    ((j + 1) / tsw, i / tsl),
-                    ((j + 1) / tsw, (i + 1) / tsl),
-                    (j / tsw, (i + 1) / tsl),
-                ]
-            )
-
-    # Create Blender object
-    mesh = bpy.data.meshes.new(f"{name}_mesh")
-    obj = bpy.data.objects.new(f"{name}", mesh)
+    rows, columns = control_point_segments.shape[:2]
+    loop_vertices, loop_starts, loop_uvs, smooth = get_leaf_topology(rows, columns)
 
-    # Create the mesh using vertices and faces
-    mesh.from_pydata(all_points, [], all_faces)
-    mesh.update()
+    mesh = bpy.data.meshes.new(name)
+
+    # Only the vertex positions depend on the leaf, faces and uvs are shared by all leaves of a resolution
+    mesh.vertices.add(rows * columns)
+    mesh.vertices.foreach_set("co", control_point_segments.astype(np.float32).ravel())
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set("vertex_index", loop_vertices)
+    mesh.polygons.add(len(loop_starts))
+    mesh.polygons.foreach_set("loop_start", loop_starts)
+    mesh.polygons.foreach_set("use_smooth", smooth)
+    mesh.update(calc_edges=True)
 
     # Add a UV map to the mesh
     uv_layer = mesh.uv_layers.new(name="CustomUVMap")
+    uv_layer.data.foreach_set("uv", loop_uvs)
+
+    if material_name is not None:
+        mesh.materials.append(bpy.data.materials[material_name])
+    return mesh
 
-    # Assign UV coordinates to the loops
-    for face_index, face in enumerate(mesh.polygons):
-        for loop_index in range(face.loop_start, face.loop_start + face.loop_total):
-            loop_uv = uv_layer.data[loop_index]
-            # Use the UVs from the corresponding face
-            loop_uv.uv = all_uvs[face_index][loop_index - face.loop_start]
+
+def leaf_rotation_y(orientation):
+    """Rotation around the y axis that matches the leaf to its orientation at the stem"""
+    return radians(-90 + 90 * orientation)
+
+
+def create_leaf_object(mesh, orientation, name, collection=None):
+    """Create an object for a leaf mesh. The leaf object is linked to the given collection,
+    or to the active collection if None."""
+    obj = bpy.data.objects.new(f"{name}", mesh)
 
     # Rotate leaf to match orientation at stem
-    obj.rotation_euler.y += radians(-90 + 90 * orientation)
+    obj.rotation_euler.y += leaf_rotation_y(orientation)
 
     obj.name = name
-    bpy.context.collection.objects.link(obj)
-    bpy.context.view_layer.objects.active = obj
-    obj.select_set(True)
-    for poly in obj.data.polygons:
-        poly.use_smooth = True  # Use smooth shading
-    obj.select_set(False)
+    if collection is None:
+        bpy.context.collection.objects.link(obj)
+        bpy.context.view_layer.objects.active = obj
+    else:
+        collection.objects.link(obj)
+    return obj
 
-    if material_name is not None:
-        obj.data.materials.append(bpy.data.materials[material_name])
 
+def create_leaf(
+    leaf_vertical_curve,
+    leaf_horizontal_curve,
+    leaf_profile,
+    leaf_rotation,
+    leaf_contour,
+    blend_contour,
+    orientation,
+    width,
+    length,
+    name,
+    material_name=None,
+    internode_width=1,
+    collection=None,
+):
+    """Create 3D leaf based on B-Spline parameterization. The leaf object is linked to the given collection,
+    or to the active collection if None."""
+    mesh = create_leaf_mesh(
+        leaf_vertical_curve,
+        leaf_horizontal_curve,
+        leaf_profile,
+        leaf_rotation,
+        leaf_contour,
+        blend_contour,
+        width,
+        length,
+        f"{name}_mesh",
+        material_name,
+        internode_width,
+    )
+    return create_leaf_object(mesh, orientation, name, collection)
 
 def create_debug_leaf(length, max_width, name, material_name=None):
     # Up/Down
@@ -0,0 +1,134 @@
+"""Cache of leaf meshes shared as linked data between the leaves of all plants.
+
+Leaf parameters are snapped to a grid before the mesh is built, so leaves whose parameters differ by less than the
+tolerance get the same mesh. Width and length are snapped relative to their value, the other shape parameters
+relative to their range. The default tolerance of 0 only shares leaves with exactly the same parameters, so the
+drawn leaves are identical to unshared ones. Approximating leaves is opt-in.
+"""
+
+from math import log, log1p, pi
+
+from . import leaf
+from .mesh_cache import MeshCache
+
+LEAF_CACHE_DEFAULT_SIZE = 2048
+LEAF_CACHE_DEFAULT_TOLERANCE = 0.0
+LEAF_MESH_PREFIX = "LeafCache"
+
+
+def snap(value, step):
+    """Grid index and snapped value, the value is kept if the step is 0"""
+    if step <= 0:
+        return value, value
+    index = round(value / step)
+    return index, index * step
+
+
+def snap_relative(value, tolerance):
+    """Grid index and snapped value on a logarithmic grid, neighbouring values differ by the tolerance"""
+    if tolerance <= 0 or value <= 0:
+        return value, value
+    index = round(log(value) / log1p(tolerance))
+    return index, (1 + tolerance) ** index
+
+
+class LeafMeshCache(MeshCache):
+    """LRU cache of wheat and maize leaf meshes keyed by their quantized parameters"""
+
+    def __init__(
+        self, max_size=LEAF_CACHE_DEFAULT_SIZE, tolerance=LEAF_CACHE_DEFAULT_TOLERANCE
+    ) -> None:
+        super().__init__(max_size, LEAF_MESH_PREFIX)
+        self.tolerance = tolerance
+
+    def configure(self, max_size, tolerance):
+        """Set size and tolerance, entries of a different tolerance are dropped"""
+        if tolerance != self.tolerance:
+            self.clear()
+        self.tolerance = tolerance
+        self.max_size = max_size
+        self.evict()
+
+    def wheat_leaf(
+        self,
+        max_width,
+        length,
+        rank,
+        seed,
+        material_name=None,
+        internode_width=1,
+        senescence=1,
+    ):
+        """Shared mesh of a wheat leaf built by leaf.create_wheat_leaf_mesh(), its shape is drawn from rank and seed"""
+        tolerance = self.tolerance
+        lower, curve_young_index, curve_senescence_index, horizontal, final_rotation = (
+            leaf.wheat_leaf_parameters(rank, seed)
+        )
+        horizontal, final_rotation = leaf.wheat_leaf_shape(
+            length, horizontal, final_rotation
+        )
+        width_index, max_width = snap_relative(max_width, tolerance)
+        length_index, length = snap_relative(length, tolerance)
+        internode_index, internode_width = snap_relative(internode_width, tolerance)
+        senescence_index, senescence = snap(senescence, tolerance)
+        # Bend reaches 0.1 of the leaf length, twist three half turns
+        horizontal_index, horizontal = snap(horizontal, tolerance * 0.2)
+        rotation_index, final_rotation = snap(final_rotation, tolerance * 3 * pi)
+
+        key = (
+            "wheat",
+            width_index,
+            length_index,
+            internode_index,
+            senescence_index,
+            lower,
+            curve_young_index,
+            curve_senescence_index,
+            horizontal_index,
+            rotation_index,
+            material_name,
+        )
+        return self.get(
+            key,
+            lambda name: leaf.create_wheat_leaf_mesh(
+                max_width,
+                length,
+                senescence,
+                internode_width,
+                lower,
+                curve_young_index,
+                curve_senescence_index,
+                horizontal,
+                final_rotation,
+                name,
+                material_name,
+            ),
+        )
+
+    def maize_leaf(self, max_width, length, curvature, rank, seed, material_name=None):
+        """Shared mesh of a maize leaf built by leaf.create_maize_leaf_mesh().
+        The random shape of maize leaves is drawn after seeding with seed and rank, so it is part of the key.
+        """
+        tolerance = self.tolerance
+        width_index, max_width = snap_relative(max_width, tolerance)
+        length_index, length = snap_relative(length, tolerance)
+        curvature_index, curvature = snap(curvature, tolerance)
+
+        key = (
+            "maize",
+            width_index,
+            length_index,
+            curvature_index,
+            seed * (rank + 1),
+            material_name,
+        )
+        return self.get(
+            key,
+            lambda name: leaf.create_maize_leaf_mesh(
+                max_width, length, curvature, rank, seed, name, material_name
+            ),
+        )
+
+
+# Shared by all plants and drawing operators
+leaf_mesh_cache = LeafMeshCache()
@@ -0,0 +1,45 @@
+"""Registry of the shared plant material libraries.
+
+Each plant model creates its materials once and tags them with a version hash of the material sources, including
+the plant model module that defines the material arguments.
+Later plants, generation runs and sessions reuse tagged materials instead of rebuilding their node trees.
+"""
+
+import functools
+import hashlib
+import sys
+
+import bpy
+
+from . import leaf_colors, leaf_textures
+
+VERSION_PROPERTY = "material_library_version"
+
+
+@functools.lru_cache(maxsize=None)
+def library_version(library_name: str, model_module: str) -> str:
+    """Hash of the library name, the material source files and the plant model module that sets up the materials,
+    changes whenever the materials or their arguments are edited
+    """
+    digest = hashlib.sha256(library_name.encode("utf-8"))
+    for module in (leaf_textures, leaf_colors, sys.modules[model_module]):
+        with open(module.__file__, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+def is_current(library_name: str, material_names, model_module: str) -> bool:
+    """Check if all materials of a library exist and were created with the current version"""
+    version = library_version(library_name, model_module)
+    for material_name in material_names:
+        material = bpy.data.materials.get(material_name, None)
+        if material is None or material.get(VERSION_PROPERTY, None) != version:
+            return False
+    return True
+
+
+def mark_current(library_name: str, material_names, model_module: str):
+    """Tag the materials of a library after they have been (re)created"""
+    version = library_version(library_name, model_module)
+    for material_name in material_names:
+        bpy.data.materials[material_name][VERSION_PROPERTY] = version
@@ -0,0 +1,114 @@
+"""LRU cache of generated meshes that are shared as linked data between objects.
+
+Entries are looked up by mesh name, references to Blender data are not kept across operator calls. Cached meshes
+have no fake user, so they are not saved with the .blend file unless an object uses them. Removing drawn plants
+keeps meshes that are still cached (see is_cached_mesh), evicted meshes are freed with their last object. The caches
+forget their entries when another file is loaded.
+"""
+
+import weakref
+from collections import OrderedDict
+
+import bpy
+from bpy.app.handlers import persistent
+
+# All mesh caches, for checking if a mesh is cached and for resetting them on file load
+_mesh_caches = weakref.WeakSet()
+
+
+def is_cached_mesh(data):
+    """Whether a data block is a mesh of any mesh cache"""
+    return isinstance(data, bpy.types.Mesh) and any(
+        data.name in cache.mesh_names for cache in _mesh_caches
+    )
+
+
+@persistent
+def forget_cached_meshes(*args):
+    """Load handler, the meshes of the previous file are gone and names may refer to meshes of the new file"""
+    for cache in list(_mesh_caches):
+        cache.forget()
+
+
+class MeshCache:
+    """Maps hashable keys to generated meshes, least recently used entries are evicted first"""
+
+    def __init__(self, max_size, prefix, max_bytes=0) -> None:
+        self.max_size = max_size
+        # Memory budget of all cached meshes, 0 for no budget
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.entries = OrderedDict()  # Key -> (mesh name, estimated size in bytes)
+        self.mesh_names = set()
+        self.total_bytes = 0
+        self.mesh_count = 0
+        self.hits = 0
+        self.misses = 0
+        _mesh_caches.add(self)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        while self.entries:
+            self.pop_oldest()
+
+    def forget(self):
+        """Drop all entries without touching their meshes"""
+        self.entries.clear()
+        self.mesh_names.clear()
+        self.total_bytes = 0
+
+    def evict(self):
+        while len(self.entries) > self.max_size or (
+            self.max_bytes > 0 and self.total_bytes > self.max_bytes
+        ):
+            self.pop_oldest()
+
+    def pop_oldest(self):
+        mesh_name, size = self.entries.popitem(last=False)[1]
+        self.total_bytes -= size
+        self.mesh_names.discard(mesh_name)
+        self.release(mesh_name)
+
+    @staticmethod
+    def release(mesh_name):
+        """Remove a mesh that left the cache right away if no object uses it"""
+        mesh = bpy.data.meshes.get(mesh_name, None)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
+    def get(self, key, create_mesh):
+        """Cached mesh of a key, create_mesh(name) builds it if the key is missing or its mesh was removed"""
+        entry = self.entries.get(key, None)
+        mesh = bpy.data.meshes.get(entry[0], None) if entry is not None else None
+        if mesh is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return mesh
+        if entry is not None:
+            # Mesh was removed outside of the cache
+            self.total_bytes -= self.entries.pop(key)[1]
+            self.mesh_names.discard(entry[0])
+
+        self.misses += 1
+        self.mesh_count += 1
+        mesh = create_mesh(f"{self.prefix}_{self.mesh_count:06d}")
+        if self.max_size <= 0:
+            return mesh
+        size = mesh_size(mesh) if self.max_bytes > 0 else 0
+        self.entries[key] = (mesh.name, size)
+        self.mesh_names.add(mesh.name)
+        self.total_bytes += size
+        self.evict()
+        return mesh
+
+
+def mesh_size(mesh):
+    """Estimated memory of a mesh in bytes: positions, edges, loops with uvs, polygons with their attributes"""
+    return (
+        12 * len(mesh.vertices)
+        + 8 * len(mesh.edges)
+        + 16 * len(mesh.loops)
+        + 16 * len(mesh.polygons)
+    )
@@ -1,6 +1,10 @@
+from collections import OrderedDict
 from scipy.interpolate import BSpline
 import numpy as np
 
+SHARED_SPLINES_MAX_SIZE = 4096
+_shared_splines = OrderedDict()
+
 
 class Spline2D:
     def __init__(self, cv, degree=3):
@@ -33,16 +37,25 @@ class Spline2D:
         self.bspline_x_derivative = self.bspline_x.derivative(nu=1)
         self.bspline_y_derivative = self.bspline_y.derivative(nu=1)
 
+    def evaluate_many(self, xs):
+        """Evaluate the spline at all positions of xs (between [0,1]), returns arrays of x and y values"""
+        u = np.asarray(xs) * (self.count - self.degree)
+        return self.bspline_x(u), self.bspline_y(u)
+
+    def evaluate_with_tangent_many(self, xs):
+        """Evaluate the spline and its tangent angle at all positions of xs (between [0,1])"""
+        u = np.asarray(xs) * (self.count - self.degree)
+        # Tangent angle is computed from the derivative in y direction
+        angle = np.arctan(self.bspline_y_derivative(u))
+        return self.bspline_x(u), self.bspline_y(u), angle
+
     def evaluate(self, x):
         # x between [0,1]
-        u = x * (self.count - self.degree)
-        return self.bspline_x(u), self.bspline_y(u)
+        return self.evaluate_many(x)
 
     def evaluate_with_tangent(self, x):
-        u = x * (self.count - self.degree)
         # return tangent as angle
-        angle = np.arctan(self.bspline_y_derivative(u), self.bspline_x_derivative(u))
-        return self.bspline_x(u), self.bspline_y(u), angle
+        return self.evaluate_with_tangent_many(x)
 
     def evaluate_range(self, samples=100):
         # Calculate query range
@@ -53,3 +66,22 @@ class Spline2D:
         y = self.bspline_y(u)
 
         return x, y
+
+
+def shared_spline(cv, degree=3) -> Spline2D:
+    """Returns a Spline2D shared by all callers with the same control points and degree.
+    Splines are built once per process, use it for constant splines that are created repeatedly.
+    The returned spline must not be modified.
+    """
+    cv = np.ascontiguousarray(cv, dtype=float)
+    key = (cv.tobytes(), cv.shape, degree)
+    spline = _shared_splines.get(key, None)
+    if spline is not None:
+        _shared_splines.move_to_end(key)
+        return spline
+
+    spline = Spline2D(cv, degree)
+    _shared_splines[key] = spline
+    if len(_shared_splines) > SHARED_SPLINES_MAX_SIZE:
+        _shared_splines.popitem(last=False)
+    return spline
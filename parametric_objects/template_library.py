@@ -0,0 +1,136 @@
+"""Template objects stored in a .blend library in the user directory of the extension.
+
+Importing OBJ files is slow and happens in every fresh scene, e.g. in every pipeline worker. The first import
+converts the templates into a .blend library, later scenes append them with bpy.data.libraries.load. The library is
+rebuilt from the OBJ files when it is missing or when the hash of the sources changed. The installed extension
+directory is never written to.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import bpy
+
+TEMPLATE_LIBRARY_VERSION = 1
+TEMPLATE_LIBRARY_NAME = "templates.blend"
+TEMPLATE_INFO_NAME = "templates.json"
+TEMPLATE_SOURCE_EXTENSIONS = (".obj", ".mtl")
+
+
+def template_library_directory():
+    """Directory of the template library, the user directory of the extension or the temporary directory"""
+    package = __package__.rpartition(".")[0]
+    try:
+        return bpy.utils.extension_path_user(package, path="templates", create=True)
+    except (AttributeError, ValueError):
+        directory = os.path.join(tempfile.gettempdir(), "lsystem_templates")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+
+def template_sources(template_directory):
+    """Sorted paths of all OBJ files and their material files in the template directory"""
+    return [
+        os.path.join(template_directory, f)
+        for f in sorted(os.listdir(template_directory))
+        if f.endswith(TEMPLATE_SOURCE_EXTENSIONS)
+        and os.path.isfile(os.path.join(template_directory, f))
+    ]
+
+
+def template_hash(template_directory):
+    """Hash of the names and contents of all template sources"""
+    digest = hashlib.sha256(str(TEMPLATE_LIBRARY_VERSION).encode("utf-8"))
+    for path in template_sources(template_directory):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def library_is_current(library_directory, source_hash):
+    """Whether the library exists and was written from the current sources"""
+    library_path = os.path.join(library_directory, TEMPLATE_LIBRARY_NAME)
+    info_path = os.path.join(library_directory, TEMPLATE_INFO_NAME)
+    if not os.path.isfile(library_path) or not os.path.isfile(info_path):
+        return False
+    try:
+        with open(info_path, "r") as file:
+            info = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring invalid template library info {info_path}: {e}")
+        return False
+    return info.get("hash", None) == source_hash
+
+
+def append_templates(library_directory, collection):
+    """Append all objects of the library and link them to the collection"""
+    library_path = os.path.join(library_directory, TEMPLATE_LIBRARY_NAME)
+    with bpy.data.libraries.load(library_path, link=False) as (data_from, data_to):
+        data_to.objects = list(data_from.objects)
+
+    objects = [obj for obj in data_to.objects if obj is not None]
+    for obj in objects:
+        obj.use_fake_user = False
+        collection.objects.link(obj)
+    return objects
+
+
+def import_obj_templates(template_directory):
+    """Import all OBJ files of the template directory into the active collection"""
+    existing = set(bpy.data.objects)
+    for path in template_sources(template_directory):
+        if path.endswith(".obj"):
+            bpy.ops.wm.obj_import(filepath=path)
+    return [obj for obj in bpy.data.objects if obj not in existing]
+
+
+def write_template_library(library_directory, objects, source_hash):
+    """Write the objects with their meshes and materials to the library, skipped if the directory is read-only"""
+    library_path = os.path.join(library_directory, TEMPLATE_LIBRARY_NAME)
+    info_path = os.path.join(library_directory, TEMPLATE_INFO_NAME)
+    # Write to temporary files first, concurrent pipeline runs never read partial libraries
+    temporary_library_path = f"{library_path}.{os.getpid()}.tmp"
+    temporary_info_path = f"{info_path}.{os.getpid()}.tmp"
+    try:
+        bpy.data.libraries.write(temporary_library_path, set(objects), fake_user=True)
+        with open(temporary_info_path, "w") as file:
+            json.dump(
+                {
+                    "hash": source_hash,
+                    "objects": sorted(obj.name for obj in objects),
+                },
+                file,
+            )
+        os.replace(temporary_library_path, library_path)
+        os.replace(temporary_info_path, info_path)
+    except OSError as e:
+        print(f"Could not write template library {library_path}: {e}")
+
+
+def import_templates(template_directory, collection, library_directory=None):
+    """Append the templates from the library, imports the OBJ files and rebuilds the library if it is stale.
+
+    Args:
+        template_directory (str): Directory with the OBJ templates
+        collection (bpy.types.Collection): Collection the appended templates are linked to
+        library_directory (str, optional): Directory of the library. Defaults to template_library_directory().
+
+    Returns:
+        list: Template objects
+    """
+    if library_directory is None:
+        library_directory = template_library_directory()
+    source_hash = template_hash(template_directory)
+    if library_is_current(library_directory, source_hash):
+        objects = append_templates(library_directory, collection)
+        if objects:
+            return objects
+        print("Template library is empty, import OBJ templates")
+
+    objects = import_obj_templates(template_directory)
+    if objects:
+        write_template_library(library_directory, objects, source_hash)
+    return objects
@@ -1,16 +1,35 @@
 from ..parametric_objects.spline import Spline2D
+from ..parametric_objects.mesh_cache import MeshCache
+from ..lsystem_interpretation.merged_mesh import MeshBuilder, mesh_geometry
 import bpy
-from mathutils import Vector, Euler, Quaternion
+from mathutils import Matrix, Vector, Euler, Quaternion
 from math import radians, cos, sin
 import numpy as np
-import time
 import random
 
+SPIKELET_OBJECT_NAME = "WheatOriginal"
+HEAD_CACHE_SIZE = 512
 
-def create_wheat_head(
-    num_spikelets=1, object_name="WheatHeadDefault", tilt=0.0, seed=0
-):
-    spikelet = bpy.data.objects.get("WheatOriginal")
+# Spikelet mesh name -> (vertex and loop count, geometry buffers)
+_spikelet_geometry = {}
+
+# Heads by spikelet count, seed, tilt and material, shared by all plants
+head_mesh_cache = MeshCache(HEAD_CACHE_SIZE, "WheatHeadCache")
+
+
+def get_spikelet_geometry(mesh):
+    """NumPy buffers of the spikelet template mesh, read once and reused for all heads"""
+    counts = (len(mesh.vertices), len(mesh.loops))
+    cached = _spikelet_geometry.get(mesh.name, None)
+    if cached is not None and cached[0] == counts:
+        return cached[1]
+    geometry = mesh_geometry(mesh)
+    _spikelet_geometry[mesh.name] = (counts, geometry)
+    return geometry
+
+
+def spikelet_transforms(num_spikelets=1, tilt=0.0, seed=0):
+    """Rotation, location and scale of every spikelet of a head, three spikelets are placed per level"""
     random.seed(seed)
     num_spikelets = max(1, int(num_spikelets / 3))
 
@@ -70,7 +89,7 @@ def create_wheat_head(
             head_tilt_rotation
             @ Euler((rotate_x_1, rotate_y_1, rotate_z_1)).to_quaternion()
         ).to_euler()
-        all_spikelets.append(create_spikelet(rotation, location, scale))
+        all_spikelets.append((rotation, location, scale))
 
         # Second spikelet
         rotate_x_2 = rotate_x + radians(random.normalvariate(mean, std_dev))
@@ -80,7 +99,7 @@ def create_wheat_head(
             head_tilt_rotation
             @ Euler((rotate_x_2, rotate_y_2, rotate_z_2)).to_quaternion()
         ).to_euler()
-        all_spikelets.append(create_spikelet(rotation, location, scale))
+        all_spikelets.append((rotation, location, scale))
 
         # Third spikelet
         rotate_x_3 = rotate_x + radians(random.normalvariate(mean, std_dev))
@@ -92,7 +111,7 @@ def create_wheat_head(
             head_tilt_rotation
             @ Euler((rotate_x_3, rotate_y_3, rotate_z_3)).to_quaternion()
         ).to_euler()
-        all_spikelets.append(create_spikelet(rotation, location, scale))
+        all_spikelets.append((rotation, location, scale))
 
         # Update angle and height location
         rotation_z += 180
@@ -114,7 +133,7 @@ def create_wheat_head(
             head_tilt_rotation
             @ Euler((radians(0), radians(-65), rotate_z)).to_quaternion()
         ).to_euler()
-        all_spikelets.append(create_spikelet(rotation, location, scale))
+        all_spikelets.append((rotation, location, scale))
         if random.random() < 0.5:
             head_tilt_rotation = Quaternion((0, 1, 0), 0)
             _, scale = head_scale.evaluate(0)
@@ -132,34 +151,63 @@ def create_wheat_head(
                 head_tilt_rotation
                 @ Euler((radians(0), radians(-65), rotate_z)).to_quaternion()
             ).to_euler()
-            all_spikelets.append(create_spikelet(rotation, location, scale))
-
-    # Join into one object
-    # bpy.ops.object.select_all(action="DESELECT")
-    active_object = all_spikelets[0]
-    bpy.context.view_layer.objects.active = active_object
-    for spikelet in all_spikelets:
-        spikelet.select_set(True)
-    bpy.ops.object.join()
-
-    active_object.location = (0, 0, 0)
-    active_object.name = object_name
-    active_object.select_set(False)
+            all_spikelets.append((rotation, location, scale))
 
+    return all_spikelets
 
-def create_spikelet(rotation_euler, location, scale):
-    original_spikelet = bpy.data.objects.get("WheatOriginal")
-
-    new_spikelet = original_spikelet.copy()
-    new_spikelet.data = original_spikelet.data.copy()
 
-    new_spikelet.location = location
-    new_spikelet.rotation_euler = rotation_euler
-    new_spikelet.scale = (scale, scale, scale)
+def create_wheat_head_mesh(
+    num_spikelets=1, name="WheatHeadDefault", tilt=0.0, seed=0, material_name=None
+):
+    """Create a wheat head mesh by transforming and concatenating the buffers of the 'WheatOriginal' spikelet.
+    The geometry is placed relative to the first spikelet and divided by its scale.
+
+    Args:
+        num_spikelets (int, optional): Number of spikelets, three spikelets are placed per level. Defaults to 1.
+        name (str, optional): Name of the created mesh. Defaults to "WheatHeadDefault".
+        tilt (float, optional): Bending of the head. Defaults to 0.0.
+        seed (int, optional): Random seed for spikelet rotations and head shape. Defaults to 0.
+        material_name (str, optional): Material replacing the spikelet materials. Defaults to None.
+
+    Returns:
+        bpy.types.Mesh: Mesh of the head
+    """
+    spikelet = bpy.data.objects.get(SPIKELET_OBJECT_NAME)
+    all_spikelets = spikelet_transforms(num_spikelets, tilt, seed)
+
+    _, first_location, first_scale = all_spikelets[0]
+    to_first_spikelet = Matrix.Diagonal(
+        (1 / first_scale, 1 / first_scale, 1 / first_scale, 1)
+    ) @ Matrix.Translation(-first_location)
+    matrices = np.array(
+        [
+            to_first_spikelet @ create_spikelet(rotation_euler, location, scale)
+            for rotation_euler, location, scale in all_spikelets
+        ]
+    )
 
-    bpy.context.scene.collection.objects.link(new_spikelet)
+    mesh_builder = MeshBuilder()
+    mesh_builder.add_mesh_instances(
+        spikelet.data, matrices, geometry=get_spikelet_geometry(spikelet.data)
+    )
+    mesh = mesh_builder.to_mesh(name)
+    if material_name is not None:
+        mesh.materials.clear()
+        mesh.materials.append(bpy.data.materials[material_name])
+    return mesh
+
+
+def wheat_head_mesh(num_spikelets=1, tilt=0.0, seed=0, material_name=None):
+    """Wheat head mesh from the head cache, heads with the same spikelet count, seed, tilt and material are shared"""
+    key = (int(num_spikelets), int(seed), float(tilt), material_name)
+    return head_mesh_cache.get(
+        key,
+        lambda name: create_wheat_head_mesh(
+            num_spikelets, name, tilt, seed, material_name
+        ),
+    )
 
-    new_spikelet.hide_viewport = False
-    new_spikelet.hide_render = False
 
-    return new_spikelet
+def create_spikelet(rotation_euler, location, scale):
+    """Transform of a spikelet within the head"""
+    return Matrix.LocRotScale(location, rotation_euler, Vector((scale, scale, scale)))
@@ -67,6 +67,9 @@ if "--" in sys.argv:
 
     general_props.derivation_length = max(iteration_steps)
     general_props.canopy_seed = config["plants"]["canopy_seed"]
+    general_props.generation_cache_directory = config["plants"].get(
+        "generation_cache_directory", ""
+    )
     general_props.model = config["plants"]["model"]
     general_props.canopy_plants_x = config["plants"]["canopy_plants_x"]
     general_props.canopy_plants_y = config["plants"]["canopy_plants_y"]
@@ -56,6 +56,9 @@ if "--" in sys.argv:
 
     plant_props.derivation_length = config["plants"]["iteration_step"]
     plant_props.canopy_seed = config["plants"]["canopy_seed"]
+    plant_props.generation_cache_directory = config["plants"].get(
+        "generation_cache_directory", ""
+    )
     plant_props.model = config["plants"]["model"]
     plant_props.canopy_plants_x = config["plants"]["canopy_plants_x"]
     plant_props.canopy_plants_y = config["plants"]["canopy_plants_y"]
@@ -35,6 +35,35 @@ class PlantProps(bpy.types.PropertyGroup):
         max=10000,
     )
 
+    state_checkpoint_interval: bpy.props.IntProperty(
+        name="State checkpoint interval",
+        description="Keep every n-th derivation state in memory, other steps are derived again when they are drawn",
+        default=1,
+        min=1,
+        max=10000,
+    )
+
+    parallel_generation: bpy.props.BoolProperty(
+        name="Parallel generation",
+        description="Derive the plants of the canopy in parallel worker processes",
+        default=False,
+    )
+
+    generation_workers: bpy.props.IntProperty(
+        name="Generation workers",
+        description="Number of worker processes for parallel generation, 0 uses all CPU cores",
+        default=0,
+        min=0,
+        max=256,
+    )
+
+    generation_cache_directory: bpy.props.StringProperty(
+        name="Generation cache directory",
+        description="Directory for caching generated lstrings between runs, caching is disabled if empty",
+        default="",
+        subtype="DIR_PATH",
+    )
+
     canopy_seed: bpy.props.IntProperty(
         name="Random seed for plants generation",
         description="",
@@ -108,3 +137,55 @@ class PlantProps(bpy.types.PropertyGroup):
         min=0.0,
         soft_max=100.0,
     )
+
+    draw_backend: bpy.props.EnumProperty(
+        name="Drawing backend",
+        description="How the organs of the plants are added to the scene",
+        items=[
+            ("objects", "Objects", "One object for every internode, leaf and head"),
+            ("merged_plant", "Merged per plant", "One mesh for every plant"),
+            ("merged_canopy", "Merged canopy", "One mesh for the whole canopy"),
+            (
+                "instances",
+                "Instanced points",
+                "One point per organ, organ geometry is instanced with geometry nodes",
+            ),
+        ],
+        default="objects",
+    )
+
+    instance_internodes: bpy.props.BoolProperty(
+        name="Instance internodes",
+        description="Share one cylinder mesh between all internodes instead of copying it for every internode",
+        default=False,
+    )
+
+    incremental_redraw: bpy.props.BoolProperty(
+        name="Incremental redraw",
+        description="Only update organs that changed since the last drawn iteration step instead of redrawing the whole canopy",
+        default=True,
+    )
+
+    step_cache_budget: bpy.props.IntProperty(
+        name="Step cache budget (MB)",
+        description="Memory for merged meshes of already drawn iteration steps, 0 disables the step cache",
+        default=1024,
+        min=0,
+        soft_max=16384,
+    )
+
+    leaf_cache_size: bpy.props.IntProperty(
+        name="Leaf cache size",
+        description="Maximum number of leaf meshes shared between plants, 0 creates a mesh for every leaf",
+        default=2048,
+        min=0,
+        soft_max=100000,
+    )
+
+    leaf_cache_tolerance: bpy.props.FloatProperty(
+        name="Leaf cache tolerance",
+        description="Relative difference of leaf parameters below which leaves share an approximated mesh, 0 only shares identical leaves",
+        default=0.0,
+        min=0.0,
+        soft_max=0.5,
+    )
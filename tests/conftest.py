@@ -0,0 +1,71 @@
+"""Load the extension as package "lsystem_extension" into Blender's bpy module.
+Tests need bpy (pip install bpy) and are skipped where it is not installed.
+"""
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+EXTENSION_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTENSION_PACKAGE = "lsystem_extension"
+
+
+def load_extension():
+    """Import and register the extension once"""
+    if EXTENSION_PACKAGE in sys.modules:
+        return sys.modules[EXTENSION_PACKAGE]
+    spec = importlib.util.spec_from_file_location(
+        EXTENSION_PACKAGE,
+        os.path.join(EXTENSION_DIRECTORY, "__init__.py"),
+        submodule_search_locations=[EXTENSION_DIRECTORY],
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[EXTENSION_PACKAGE] = package
+    spec.loader.exec_module(package)
+    package.register()
+    return package
+
+
+if importlib.util.find_spec("bpy") is not None:
+    load_extension()
+
+
+@pytest.fixture
+def collection():
+    """Empty collection linked to the scene, removed with all its objects after the test"""
+    import bpy
+
+    from lsystem_extension.lsystem_interpretation.scene_teardown import (
+        remove_collection,
+    )
+
+    collection = bpy.data.collections.new("test_collection")
+    bpy.context.scene.collection.children.link(collection)
+    yield collection
+    remove_collection(collection)
+
+
+@pytest.fixture(scope="session")
+def wheat_derivation():
+    """Derivation of a single wheat plant with 120 steps"""
+    import random
+
+    import bpy
+
+    from lsystem_extension.lsystem_generation import canopy_generation, wheat_model
+    from lsystem_extension.parametric_objects.wheat_head import SPIKELET_OBJECT_NAME
+
+    # Template objects are stored with Git LFS, a triangle stands in for the spikelet
+    if bpy.data.objects.get(SPIKELET_OBJECT_NAME, None) is None:
+        mesh = bpy.data.meshes.new(SPIKELET_OBJECT_NAME)
+        mesh.from_pydata([(0, 0, 0), (0.1, 0, 0), (0, 0, 0.3)], [], [(0, 1, 2)])
+        bpy.data.objects.new(SPIKELET_OBJECT_NAME, mesh)
+    random.seed(0)
+    random_state = random.getstate()
+    grammar_args = (120, 1, 1, {}, 0)
+    lsystem, _, _ = wheat_model.wheat(*grammar_args)
+    return canopy_generation.derive_canopy(
+        [(lsystem, grammar_args, random_state)], wheat_model.wheat_grammar
+    )[0]
@@ -0,0 +1,38 @@
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+from lsystem_extension.lsystem_interpretation import draw_lsystem
+from lsystem_extension.lsystem_interpretation.scene_diff import PlantDiff
+from lsystem_extension.parametric_objects.leaf_cache import leaf_mesh_cache
+
+
+@pytest.mark.parametrize("leaf_cache_size", [0, 4, 2048])
+def test_incremental_redraws_do_not_leak_meshes(
+    collection, wheat_derivation, leaf_cache_size
+):
+    leaf_mesh_cache.configure(leaf_cache_size, 0.0)
+    root_object = bpy.data.objects.new("Plant_0_0", None)
+    collection.objects.link(root_object)
+    plant_diff = PlantDiff()
+
+    mesh_counts = []
+    for step in [60, 90, 120] * 3:
+        plant_diff.begin()
+        draw_lsystem.interpret(
+            wheat_derivation.modules(step),
+            collection,
+            root_object,
+            1.0,
+            0.5,
+            1.0,
+            draw_lsystem.DrawWheat,
+            scene_diff=plant_diff,
+        )
+        plant_diff.finish()
+        mesh_counts.append(len(bpy.data.meshes))
+
+    assert plant_diff.reused > 0
+    # Meshes of all steps exist after the first cycle, later cycles must not add any
+    assert mesh_counts[6:9] == mesh_counts[3:6]
+    leaf_mesh_cache.clear()
@@ -0,0 +1,90 @@
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+from lsystem_extension.lsystem_interpretation import draw_lsystem
+from lsystem_extension.lsystem_interpretation.merged_mesh import MeshBuilder
+from lsystem_extension.lsystem_interpretation.scene_teardown import remove_objects
+from lsystem_extension.parametric_objects.ground_plane import (
+    ground_mesh_cache,
+    ground_plane_mesh,
+)
+from lsystem_extension.parametric_objects.leaf_cache import leaf_mesh_cache
+from lsystem_extension.parametric_objects.mesh_cache import MeshCache, is_cached_mesh
+
+
+def create_mesh(name):
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(3)
+    return mesh
+
+
+def test_cached_meshes_are_not_saved_without_objects(tmp_path):
+    cache = MeshCache(4, "TestCache")
+    mesh = cache.get("a", create_mesh)
+    assert not mesh.use_fake_user
+
+    path = str(tmp_path / "cache.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=path, copy=True)
+    with bpy.data.libraries.load(path) as (data_from, data_to):
+        saved_meshes = list(data_from.meshes)
+    assert mesh.name not in saved_meshes
+    cache.clear()
+
+
+def test_teardown_keeps_cached_meshes_and_frees_evicted_ones(collection):
+    cache = MeshCache(1, "TestCache")
+    mesh = cache.get("a", create_mesh)
+    mesh_name = mesh.name
+    obj = bpy.data.objects.new("CachedMeshObject", mesh)
+    collection.objects.link(obj)
+
+    remove_objects([obj])
+    assert bpy.data.meshes.get(mesh_name, None) is not None
+    assert cache.get("a", create_mesh).name == mesh_name
+
+    obj = bpy.data.objects.new("CachedMeshObject", bpy.data.meshes[mesh_name])
+    collection.objects.link(obj)
+    cache.get("b", create_mesh)
+    assert not is_cached_mesh(bpy.data.meshes[mesh_name])
+    remove_objects([obj])
+    assert bpy.data.meshes.get(mesh_name, None) is None
+    cache.clear()
+
+
+def test_ground_plane_is_shared_and_not_saved_without_objects(tmp_path):
+    mesh = ground_plane_mesh(1.0, size=20)
+    assert ground_plane_mesh(1.0, size=20) == mesh
+    assert not mesh.use_fake_user
+    assert is_cached_mesh(mesh)
+
+    path = str(tmp_path / "ground.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=path, copy=True)
+    with bpy.data.libraries.load(path) as (data_from, data_to):
+        saved_meshes = list(data_from.meshes)
+    assert mesh.name not in saved_meshes
+    ground_mesh_cache.clear()
+
+
+def test_merged_draws_without_leaf_cache_do_not_leak_meshes(
+    collection, wheat_derivation
+):
+    leaf_mesh_cache.configure(0, 0.0)
+    root_object = bpy.data.objects.new("Plant_0_0", None)
+    collection.objects.link(root_object)
+
+    mesh_counts = []
+    for _ in range(3):
+        draw_lsystem.interpret(
+            wheat_derivation.modules(120),
+            collection,
+            root_object,
+            1.0,
+            0.5,
+            1.0,
+            draw_lsystem.DrawWheat,
+            mesh_builder=MeshBuilder(),
+        )
+        mesh_counts.append(len(bpy.data.meshes))
+
+    assert mesh_counts[1:] == mesh_counts[:-1]
@@ -0,0 +1,50 @@
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+import numpy as np
+
+from lsystem_extension.lsystem_interpretation import draw_lsystem
+from lsystem_extension.lsystem_interpretation.point_instancer import (
+    PASS_INDEX_ATTRIBUTE,
+    ROTATION_ATTRIBUTE,
+    PointInstancer,
+)
+
+
+def draw_points(lstring, collection):
+    if bpy.data.materials.get("TestMaterial", None) is None:
+        bpy.data.materials.new("TestMaterial")
+    root_object = bpy.data.objects.new("Root", None)
+    collection.objects.link(root_object)
+    instancer = PointInstancer()
+    draw_lsystem.interpret(
+        lstring, collection, root_object, 1.0, 0.5, 1.0, mesh_builder=instancer
+    )
+    return instancer, instancer.create_object("Points", collection).data
+
+
+def point_attribute(mesh, name, size, dtype):
+    values = np.empty(len(mesh.vertices) * size, dtype=dtype)
+    attribute = mesh.attributes[name]
+    attribute.data.foreach_get("value", values)
+    return values.reshape(len(mesh.vertices), size)
+
+
+def test_zero_length_internodes_have_valid_rotations(collection):
+    _, mesh = draw_points("F(0)+(30)F(1)F(0,TestMaterial,3)&(20)F(2)", collection)
+
+    rotations = point_attribute(mesh, ROTATION_ATTRIBUTE, 4, np.float32)
+    assert len(rotations) == 4
+    assert np.isfinite(rotations).all()
+    assert np.allclose(np.linalg.norm(rotations, axis=1), 1, atol=1e-5)
+
+
+def test_organs_with_different_pass_indices_share_templates(collection):
+    instancer, mesh = draw_points(
+        "F(1,TestMaterial,1)F(1,TestMaterial,2)F(1,TestMaterial,3)", collection
+    )
+
+    assert len(instancer.templates) == 1
+    pass_indices = point_attribute(mesh, PASS_INDEX_ATTRIBUTE, 1, np.int32)
+    assert pass_indices.ravel().tolist() == [1, 2, 3]
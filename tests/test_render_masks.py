@@ -0,0 +1,42 @@
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+from lsystem_extension.lsystem_interpretation.merged_mesh import ORGAN_LABEL_ATTRIBUTE
+from lsystem_extension.lsystem_interpretation.point_instancer import (
+    PASS_INDEX_ATTRIBUTE,
+)
+from lsystem_extension.operators.camera_render_operator import (
+    PASS_INDEX_AOV,
+    PASS_INDEX_AOV_NODE,
+    add_pass_index_aov,
+)
+
+
+def test_materials_write_the_pass_index_aov_once():
+    material = bpy.data.materials.new("AOVTestMaterial")
+    material.use_nodes = True
+    view_layer = bpy.context.view_layer
+
+    add_pass_index_aov(view_layer)
+    add_pass_index_aov(view_layer)
+
+    assert [aov.name for aov in view_layer.aovs].count(PASS_INDEX_AOV) == 1
+    aov_outputs = [
+        node
+        for node in material.node_tree.nodes
+        if node.bl_idname == "ShaderNodeOutputAOV"
+    ]
+    assert [node.name for node in aov_outputs] == [PASS_INDEX_AOV_NODE]
+    assert aov_outputs[0].aov_name == PASS_INDEX_AOV
+    assert aov_outputs[0].inputs["Value"].is_linked
+    attributes = {
+        (node.attribute_type, node.attribute_name)
+        for node in material.node_tree.nodes
+        if node.bl_idname == "ShaderNodeAttribute"
+    }
+    assert attributes == {
+        ("GEOMETRY", ORGAN_LABEL_ATTRIBUTE),
+        ("INSTANCER", PASS_INDEX_ATTRIBUTE),
+    }
+    bpy.data.materials.remove(material)
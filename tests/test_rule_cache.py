@@ -0,0 +1,15 @@
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+from lsystem_extension.lsystem_generation.parametric_lsystem import RuleCache
+
+
+def test_parameter_types_are_separate_entries():
+    def rule(symbol, params):
+        return ((symbol, [type(p).__name__ for p in params]),)
+
+    cache = RuleCache()
+    results = [cache.apply(rule, "A", params)[0][1] for params in ([1], [1.0], [True])]
+    assert results == [["int"], ["float"], ["bool"]]
+    assert cache.misses == 3
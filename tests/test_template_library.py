@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+from lsystem_extension.lsystem_interpretation.scene_teardown import remove_objects
+from lsystem_extension.parametric_objects.template_library import (
+    TEMPLATE_INFO_NAME,
+    TEMPLATE_LIBRARY_NAME,
+    import_templates,
+)
+
+
+def test_library_is_written_outside_of_the_template_directory(tmp_path, collection):
+    template_directory = tmp_path / "template_objects"
+    template_directory.mkdir()
+    (template_directory / "TestTemplate.obj").write_text(
+        "o TestTemplate\nv 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n"
+    )
+    library_directory = tmp_path / "library"
+    library_directory.mkdir()
+
+    imported = import_templates(
+        str(template_directory), collection, str(library_directory)
+    )
+    assert [obj.name for obj in imported] == ["TestTemplate"]
+    assert sorted(os.listdir(template_directory)) == ["TestTemplate.obj"]
+    assert (library_directory / TEMPLATE_LIBRARY_NAME).is_file()
+    assert (library_directory / TEMPLATE_INFO_NAME).is_file()
+    remove_objects(imported)
+
+    appended = import_templates(
+        str(template_directory), collection, str(library_directory)
+    )
+    assert [obj.name for obj in appended] == ["TestTemplate"]
+    assert appended[0].name in collection.objects